@@ -0,0 +1,305 @@
+import json
+import os
+import queue
+import logging
+import threading
+import time
+
+import mysql.connector
+
+from metrics import registry as metrics
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN_NAME = "نامشخص"
+SPOOL_PATH = "attendance_spool.jsonl"
+
+INSERT_ATTENDANCE = """
+    INSERT INTO attendance (national_code, checkin_time, location)
+    VALUES (%s, %s, %s)
+"""
+
+UPSERT_LATEST = """
+    INSERT INTO latest_attendance (national_code, first_name, last_name, last_seen, location)
+    VALUES (%s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        first_name = VALUES(first_name),
+        last_name = VALUES(last_name),
+        last_seen = VALUES(last_seen),
+        location = VALUES(location)
+"""
+
+
+class AttendanceWriter:
+    """
+    نویسنده غیرهمزمان رویدادهای حضور در MySQL.
+    رویدادها از حلقه فریم در یک صف محدود قرار می‌گیرند و یک رشته پس‌زمینه آن‌ها را به صورت دسته‌ای
+    با executemany و یک commit برای هر دسته می‌نویسد؛ بنابراین تأخیر دیتابیس به حلقه فریم منتقل نمی‌شود.
+    اگر صف پر باشد یا MySQL در دسترس نباشد، رویدادها در فایل spool روی دیسک ذخیره می‌شوند
+    و پس از برقراری مجدد اتصال، پیش از رویدادهای جدید نوشته می‌شوند.
+    نام افراد از identity_cache خوانده می‌شود و فقط برای کدهای ملی خارج از کش به NewPerson کوئری زده می‌شود.
+    هر رویداد یک دیکشنری با کلیدهای national_code، location، checkin_time و insert_attendance است.
+    connect: تابع ایجاد اتصال (پیش‌فرض mysql.connector.connect)؛ برای بنچمارک با دیتابیس جایگزین قابل تغییر است.
+    """
+    def __init__(self, db_config, identity_cache=None, spool_path=SPOOL_PATH, max_queue=10000,
+                 batch_size=200, flush_interval=0.5, retry_interval=5.0, connect=None):
+        self.db_config = db_config
+        self.connect = connect or mysql.connector.connect
+        self.identity_cache = identity_cache
+        self._cache_warmed = False
+        self.spool_path = spool_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval  # حداکثر زمان انتظار برای تکمیل یک دسته (ثانیه)
+        self.retry_interval = retry_interval  # فاصله تلاش مجدد برای اتصال به دیتابیس (ثانیه)
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.db = None
+        self._last_connect_attempt = 0.0
+        self._spool_lock = threading.Lock()
+        self._spool_pending = True  # تا خالی شدن spool، رویدادهای جدید هم به آن اضافه می‌شوند
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.written = 0
+        self.spooled = 0
+
+    # --------------------- سمت حلقه فریم ---------------------
+    def submit(self, event):
+        """قرار دادن رویداد در صف بدون مسدود کردن؛ در صورت پر بودن صف، رویداد در spool ذخیره می‌شود"""
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            logger.warning("صف حضور پر است؛ رویداد در فایل spool ذخیره شد.")
+            self._spool([event])
+
+    def depth(self):
+        """تعداد رویدادهای در انتظار نوشتن"""
+        return self.queue.qsize()
+
+    # --------------------- اتصال به دیتابیس ---------------------
+    def _connect(self):
+        """برقراری اتصال به دیتابیس با رعایت فاصله تلاش مجدد"""
+        # خطای نوشتن، اتصال را None می‌کند؛ پس نیازی به ping در هر دسته نیست
+        if self.db is not None:
+            return True
+        now = time.monotonic()
+        if now - self._last_connect_attempt < self.retry_interval:
+            return False
+        self._last_connect_attempt = now
+        try:
+            self.db = self.connect(**self.db_config)
+            logger.info("اتصال به دیتابیس برقرار شد.")
+        except mysql.connector.Error as err:
+            logger.error(f"خطا در اتصال به دیتابیس: {err}")
+            self.db = None
+            return False
+
+        if self.identity_cache is not None and not self._cache_warmed:
+            try:
+                self.identity_cache.warm(self.db)
+                self._cache_warmed = True
+            except mysql.connector.Error as err:
+                logger.error(f"خطا در بارگذاری کش هویت: {err}")
+        return True
+
+    # --------------------- فایل spool ---------------------
+    def _spool(self, events):
+        with self._spool_lock:
+            with open(self.spool_path, 'a', encoding='utf-8') as spool_file:
+                for event in events:
+                    spool_file.write(json.dumps(event, ensure_ascii=False) + "\n")
+            self.spooled += len(events)
+
+    def _replay_spool(self):
+        """نوشتن رویدادهای ذخیره‌شده در spool پس از برقراری اتصال"""
+        with self._spool_lock:
+            if not os.path.exists(self.spool_path):
+                return True
+            events, malformed = [], []
+            with open(self.spool_path, encoding='utf-8') as spool_file:
+                for line in spool_file:
+                    if not line.strip():
+                        continue
+                    try:
+                        events.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # مثلاً خط نیمه‌کاره پس از قطع برنامه در حین نوشتن
+                        malformed.append(line if line.endswith("\n") else line + "\n")
+            if malformed:
+                with open(self.spool_path + ".bad", 'a', encoding='utf-8') as bad_file:
+                    bad_file.writelines(malformed)
+                logger.error(f"{len(malformed)} خط نامعتبر spool به {self.spool_path}.bad منتقل شد.")
+            os.remove(self.spool_path)
+
+        for i in range(0, len(events), self.batch_size):
+            batch = events[i:i + self.batch_size]
+            try:
+                written = self._write_batch(batch)
+            except Exception:
+                # فایل spool حذف شده است؛ رویدادهای باقی‌مانده پیش از انتشار خطا دوباره ذخیره می‌شوند
+                self._spool(events[i:])
+                raise
+            if not written:
+                self._spool(events[i:])
+                return False
+        if events:
+            logger.info(f"{len(events)} رویداد حضور از فایل spool نوشته شد.")
+        return True
+
+    # --------------------- نوشتن دسته‌ای ---------------------
+    def _lookup_names(self, cursor, national_codes):
+        """دریافت نام افراد یک دسته؛ از کش و در صورت نبودن در کش با یک کوئری"""
+        names = {}
+        missing = []
+        for national_code in national_codes:
+            if self.identity_cache is None:
+                missing.append(national_code)
+                continue
+            found, name = self.identity_cache.lookup(national_code)
+            if not found:
+                missing.append(national_code)
+            elif name is not None:
+                names[national_code] = name
+        if not missing:
+            return names
+
+        placeholders = ", ".join(["%s"] * len(missing))
+        cursor.execute(
+            f"SELECT national_code, first_name, last_name FROM NewPerson WHERE national_code IN ({placeholders})",
+            tuple(missing)
+        )
+        fetched = {str(code): (first_name, last_name) for code, first_name, last_name in cursor.fetchall()}
+        names.update(fetched)
+        if self.identity_cache is not None:
+            for national_code in missing:
+                self.identity_cache.put(national_code, fetched.get(national_code))
+        return names
+
+    def _write_batch(self, events):
+        """نوشتن یک دسته رویداد با executemany و یک commit؛ False در صورت خطا"""
+        if not self._connect():
+            return False
+
+        cursor = None
+        start = time.perf_counter()
+        try:
+            cursor = self.db.cursor()
+            attendance_rows = [
+                (e['national_code'], e['checkin_time'], e['location'])
+                for e in events if e['insert_attendance']
+            ]
+            # برای latest_attendance فقط آخرین رویداد هر فرد در دسته اهمیت دارد
+            latest = {e['national_code']: e for e in events}
+
+            try:
+                names = self._lookup_names(cursor, list(latest))
+            except mysql.connector.Error as e:
+                logger.error(f"خطا در دریافت اطلاعات کاربر: {e}")
+                names = {}
+
+            latest_rows = []
+            for national_code, e in latest.items():
+                first_name, last_name = names.get(national_code, (UNKNOWN_NAME, UNKNOWN_NAME))
+                latest_rows.append((national_code, first_name, last_name, e['checkin_time'], e['location']))
+
+            if attendance_rows:
+                cursor.executemany(INSERT_ATTENDANCE, attendance_rows)
+            cursor.executemany(UPSERT_LATEST, latest_rows)
+            self.db.commit()
+            metrics.observe("attendance_db_batch_seconds", time.perf_counter() - start)
+            metrics.observe("attendance_db_batch_size", len(events), buckets=(1, 5, 10, 25, 50, 100, 200, 500))
+            self.written += len(events)
+            logger.debug(f"{len(events)} رویداد حضور در دیتابیس نوشته شد.")
+            return True
+        except mysql.connector.Error as e:
+            logger.error(f"خطا در نوشتن دسته‌ای حضور: {e}")
+            metrics.inc("attendance_db_errors_total")
+            try:
+                self.db.rollback()
+            except mysql.connector.Error:
+                pass
+            self.db = None
+            return False
+        finally:
+            if cursor is not None:
+                try:
+                    cursor.close()
+                except mysql.connector.Error:
+                    pass
+
+    def _next_batch(self):
+        """جمع‌آوری یک دسته از صف تا batch_size رویداد یا پایان flush_interval"""
+        try:
+            batch = [self.queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            batch = []
+            try:
+                if self._spool_pending and self._connect():
+                    self._spool_pending = not self._replay_spool()
+                batch = self._next_batch()
+                if not batch:
+                    continue
+                if self._spool_pending or not self._write_batch(batch):
+                    # ترتیب رویدادها حفظ می‌شود
+                    self._spool(batch)
+                    self._spool_pending = True
+            except Exception as e:
+                # خطای غیرمنتظره نباید رشته نویسنده را متوقف کند
+                logger.exception(f"خطای غیرمنتظره در نویسنده حضور: {e}")
+                if batch:
+                    try:
+                        self._spool(batch)
+                        self._spool_pending = True
+                    except OSError as spool_error:
+                        logger.error(f"خطا در ذخیره رویدادها در spool: {spool_error}")
+                self._stop_event.wait(self.retry_interval)
+
+        # نوشتن رویدادهای باقی‌مانده هنگام خروج
+        batch = self._drain()
+        if self._spool_pending:
+            if batch:
+                self._spool(batch)
+            return
+        for i in range(0, len(batch), self.batch_size):
+            chunk = batch[i:i + self.batch_size]
+            if not self._write_batch(chunk):
+                self._spool(batch[i:])
+                break
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="attendance-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """توقف نویسنده، نوشتن رویدادهای باقی‌مانده و بستن اتصال"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        if self.db is not None:
+            try:
+                self.db.close()
+            except mysql.connector.Error:
+                pass
+            self.db = None
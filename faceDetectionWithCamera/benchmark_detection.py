@@ -0,0 +1,101 @@
+"""
+بنچمارک پروفایل‌های تشخیص چهره روی مجموعه‌ای از تصاویر نمونه محلی.
+برای هر پروفایل میانگین زمان تشخیص و recall (نسبت چهره‌های مرجع که با IoU >= 0.5 پیدا شده‌اند) گزارش می‌شود.
+
+چهره‌های مرجع از فایل annotations.json در پوشه تصاویر خوانده می‌شوند:
+    {"img1.jpg": [[x, y, w, h], ...], ...}
+اگر این فایل وجود نداشته باشد، خروجی پروفایل پیش‌فرض (وضوح کامل، scaleFactor=1.3) به عنوان مرجع استفاده می‌شود.
+
+اجرا:
+    python benchmark_detection.py samples/ --scales 1.0 0.75 0.5 --min-size 40 --max-size 300
+"""
+import argparse
+import json
+import os
+import time
+
+import cv2
+
+from detection_profile import DetectionProfile, iou
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def load_images(directory):
+    images = {}
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith(IMAGE_EXTENSIONS):
+            image = cv2.imread(os.path.join(directory, name))
+            if image is not None:
+                gray = cv2.equalizeHist(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY))
+                images[name] = gray
+    return images
+
+
+def recall(found, expected, threshold=0.5):
+    """تعداد چهره‌های مرجعی که با یک مستطیل تشخیص‌داده‌شده تطبیق دارند"""
+    remaining = list(found)
+    hits = 0
+    for box in expected:
+        best = max(remaining, key=lambda f: iou(f, box), default=None)
+        if best is not None and iou(best, box) >= threshold:
+            remaining.remove(best)
+            hits += 1
+    return hits
+
+
+def run_profile(cascade, profile, images, ground_truth, repeats):
+    total_time = 0.0
+    hits = expected = 0
+    for name, gray in images.items():
+        start = time.perf_counter()
+        for _ in range(repeats):
+            faces = profile.detect(cascade, gray)
+        total_time += (time.perf_counter() - start) / repeats
+        hits += recall(faces, ground_truth[name])
+        expected += len(ground_truth[name])
+    mean_ms = total_time / len(images) * 1000
+    return mean_ms, (hits / expected if expected else 1.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="بنچمارک زمان و recall پروفایل‌های تشخیص چهره")
+    parser.add_argument("images", help="پوشه تصاویر نمونه")
+    parser.add_argument("--scales", type=float, nargs="+", default=[1.0, 0.75, 0.5])
+    parser.add_argument("--scale-factors", type=float, nargs="+", default=[1.3, 1.1])
+    parser.add_argument("--min-size", type=int, default=None, help="حداقل اندازه چهره (پیکسل در وضوح اصلی)")
+    parser.add_argument("--max-size", type=int, default=None, help="حداکثر اندازه چهره (پیکسل در وضوح اصلی)")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    images = load_images(args.images)
+    if not images:
+        parser.error("هیچ تصویری در پوشه یافت نشد.")
+    cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+
+    annotations_path = os.path.join(args.images, "annotations.json")
+    if os.path.exists(annotations_path):
+        with open(annotations_path, encoding='utf-8') as f:
+            ground_truth = {name: [tuple(box) for box in boxes] for name, boxes in json.load(f).items()}
+        images = {name: gray for name, gray in images.items() if name in ground_truth}
+        reference = "annotations.json"
+    else:
+        baseline = DetectionProfile()
+        ground_truth = {name: baseline.detect(cascade, gray) for name, gray in images.items()}
+        reference = "پروفایل پیش‌فرض"
+
+    min_size = (args.min_size, args.min_size) if args.min_size else None
+    max_size = (args.max_size, args.max_size) if args.max_size else None
+
+    print(f"{len(images)} تصویر، مرجع: {reference}")
+    print(f"{'scale':>6} | {'scaleFactor':>11} | {'min/max':>11} | {'ms/image':>9} | {'recall':>7}")
+    for scale_factor in args.scale_factors:
+        for scale in args.scales:
+            profile = DetectionProfile(scale=scale, scale_factor=scale_factor, min_size=min_size, max_size=max_size)
+            mean_ms, rec = run_profile(cascade, profile, images, ground_truth, args.repeats)
+            sizes = f"{args.min_size or '-'}/{args.max_size or '-'}"
+            print(f"{scale:>6.2f} | {scale_factor:>11.2f} | {sizes:>11} | {mean_ms:>9.2f} | {rec:>7.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+بنچمارک زمان ثبت‌نام یک فرد جدید در دو حالت:
+  - full:        مسیر قدیمی؛ خواندن همه رکوردها (JSON + Base64 + JPEG)، رمزگشایی و آموزش کامل مدل
+  - incremental: مسیر جدید؛ FaceModelStore.add_identity با update() فقط برای فرد جدید
+زمان update() (هزینه درخواست ثبت‌نام) و زمان ذخیره model.xml (که با تعداد افراد رشد خطی دارد و در
+رشته پس‌زمینه برای همه ثبت‌نام‌های یک بازه save_delay یک بار انجام می‌شود) جداگانه گزارش می‌شوند.
+رکوردهای Redis با داده‌های مصنوعی در حافظه شبیه‌سازی می‌شوند تا نیازی به Redis/MySQL نباشد.
+
+اجرا:
+    python benchmark_enrollment.py --sizes 100 1000 10000
+"""
+import argparse
+import base64
+import json
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from model_store import FaceModelStore, FACE_SIZE
+
+
+def synthetic_face(rng):
+    """تولید یک چهره مصنوعی 200x200 (هم‌اندازه خروجی detect_and_validate_face)"""
+    return rng.integers(0, 256, size=(200, 200), dtype=np.uint8)
+
+
+def encode_record(label, face):
+    """ساخت رکورد هم‌قالب save_to_redis"""
+    _, buffer = cv2.imencode('.jpg', face)
+    return json.dumps({
+        "firstName": f"first{label}",
+        "lastName": f"last{label}",
+        "faceImage": base64.b64encode(buffer).decode('utf-8'),
+    })
+
+
+def full_retrain(records, store):
+    """شبیه‌سازی train_model: رمزگشایی همه رکوردها و آموزش از صفر"""
+    faces, labels, labels_to_name = [], [], {}
+    for key, value in records.items():
+        data = json.loads(value)
+        np_arr = np.frombuffer(base64.b64decode(data['faceImage']), np.uint8)
+        face_image = cv2.imdecode(np_arr, cv2.IMREAD_GRAYSCALE)
+        faces.append(cv2.resize(face_image, FACE_SIZE))
+        labels.append(key)
+        labels_to_name[key] = {
+            "full_name": f"{data['firstName']} {data['lastName']}",
+            "student_id": str(key)
+        }
+    store.rebuild(np.array(faces), labels, labels_to_name)
+
+
+def run(size, rng, workdir):
+    records = {label: encode_record(label, synthetic_face(rng)) for label in range(1, size + 1)}
+    # ذخیره معوق فقط با flush() انجام می‌شود تا زمان آن جدا از update() اندازه‌گیری شود
+    store = FaceModelStore(
+        model_path=os.path.join(workdir, f"model_{size}.xml"),
+        labels_path=os.path.join(workdir, f"labels_{size}.json"),
+        save_delay=3600,
+    )
+    full_retrain(records, store)  # ساخت مدل پایه با size نفر
+
+    new_label = size + 1
+    new_face = synthetic_face(rng)
+
+    # مسیر قدیمی: رکورد جدید اضافه و کل مدل بازسازی می‌شود
+    records[new_label] = encode_record(new_label, new_face)
+    start = time.perf_counter()
+    full_retrain(records, store)
+    full_time = time.perf_counter() - start
+    del records[new_label]
+    full_retrain(records, store)
+
+    # مسیر جدید: فقط فرد جدید به مدل اضافه می‌شود و ذخیره در پس‌زمینه انجام می‌شود
+    start = time.perf_counter()
+    store.add_identity(new_label, f"first{new_label} last{new_label}", new_face)
+    update_time = time.perf_counter() - start
+    store.flush()
+
+    return full_time, update_time, store.last_save_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="بنچمارک زمان ثبت‌نام (آموزش کامل در برابر افزایشی)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000],
+                        help="تعداد افراد ثبت‌شده پیش از ثبت‌نام جدید")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'identities':>10} | {'full (s)':>10} | {'update (s)':>10} | {'persist (s)':>11} | {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            full_time, update_time, persist_time = run(size, rng, workdir)
+            print(f"{size:>10} | {full_time:>10.3f} | {update_time:>10.3f} | {persist_time:>11.3f} | "
+                  f"{full_time / update_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,403 @@
+"""
+بنچمارک/بازپخش خط پردازش CameraManager بدون دوربین واقعی و بدون MySQL و Redis.
+دوربین‌ها از فایل‌های ویدیویی محلی (با تکرار از ابتدا پس از پایان فایل) یا از مولد فریم مصنوعی تغذیه می‌شوند،
+با نرخ ثابت (--fps) یا با حداکثر سرعت (--fps 0). دیتابیس با یک دیتابیس درون‌حافظه‌ای جایگزین می‌شود
+و مدل LBPH از چهره‌های مصنوعی در یک پوشه موقت ساخته می‌شود (مگر اینکه --model داده شود).
+فریم‌های مصنوعی شامل --faces-per-camera چهره ترسیمی از افراد همان مدل هستند که Haar آن‌ها را تشخیص می‌دهد،
+پس predict، موتور حضور و نویسنده حضور هم اجرا می‌شوند (db_rows تعداد ردیف‌های نوشته‌شده است).
+
+برای هر تعداد دوربین گزارش می‌شود:
+  - FPS کل و میانگین هر دوربین
+  - صدک‌های تأخیر پردازش هر فریم (از آماده شدن فریم منبع تا فریم پردازش‌شده، p50/p90/p99)
+  - میانگین زمان انتظار برای نرخ فریم منبع (جدا از تأخیر پردازش)
+  - درصد مصرف CPU (نسبت به یک هسته) پروسه و پروسه‌های استخر تشخیص فقط در بازه اندازه‌گیری، و حافظه RSS پروسه
+
+اجرا:
+    python benchmark_pipeline.py --cameras 1 4 16 --duration 20
+    python benchmark_pipeline.py --videos samples/hall.mp4 samples/door.mp4 --fps 25 --tracking --output base.json
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from faceDetectionWithCamera import CameraManager, FACE_CASCADE_PATH
+from face_preprocess import FacePreprocessor
+from model_store import FaceModelStore
+
+# زمان پایان انتظار نرخ فریم آخرین read() در هر رشته دوربین
+_paced = threading.local()
+
+
+class PacedSource:
+    """پایه منابع شبیه‌سازی‌شده: رعایت نرخ فریم ثابت (fps=0 یعنی بدون انتظار)"""
+    def __init__(self, fps):
+        self.interval = 1.0 / fps if fps > 0 else 0.0
+        self._next_time = None
+
+    def _pace(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self._next_time is None or self._next_time < now - self.interval:
+            # عقب ماندن از نرخ هدف انباشته نمی‌شود (مثل دوربین واقعی که فریم‌های قدیمی را دور می‌ریزد)
+            self._next_time = now
+        elif self._next_time > now:
+            time.sleep(self._next_time - now)
+        self._next_time += self.interval
+        _paced.ready = time.perf_counter()
+
+    def isOpened(self):
+        return True
+
+    def release(self):
+        pass
+
+
+def synthetic_face(size, rng):
+    """
+    ترسیم یک چهره خاکستری size x size (بیضی با بافت پوست، ابرو، چشم، بینی و دهان) که cascade چهره
+    آن را تشخیص می‌دهد؛ بافت و جای اجزا برای هر فرد متفاوت است تا LBPH افراد را از هم جدا کند.
+    """
+    face = np.full((size, size), 60, dtype=np.uint8)
+    skin = int(rng.integers(170, 220))
+    mask = np.zeros_like(face)
+    cv2.ellipse(mask, (size // 2, size // 2), (int(size * 0.36), int(size * 0.46)), 0, 0, 360, 255, -1)
+    texture = np.clip(skin + rng.normal(0, 18, face.shape), 0, 255).astype(np.uint8)
+    texture = cv2.GaussianBlur(texture, (0, 0), size / 50)
+    face[mask > 0] = texture[mask > 0]
+    eye_y, eye_x = int(size * rng.uniform(0.37, 0.42)), int(size * rng.uniform(0.15, 0.19))
+    for cx in (size // 2 - eye_x, size // 2 + eye_x):
+        cv2.ellipse(face, (cx, eye_y - int(size * 0.07)), (int(size * 0.10), int(size * 0.02)), 0, 180, 360,
+                    int(rng.integers(20, 80)), -1)
+        cv2.ellipse(face, (cx, eye_y), (int(size * 0.08), int(size * 0.045)), 0, 0, 360, 40, -1)
+    cv2.line(face, (size // 2, int(size * 0.45)), (size // 2 - int(size * 0.04), int(size * 0.60)),
+             skin - 60, max(1, size // 40))
+    cv2.ellipse(face, (size // 2, int(size * rng.uniform(0.70, 0.75))),
+                (int(size * rng.uniform(0.10, 0.16)), int(size * 0.04)), 0, 0, 360, 70, -1)
+    return cv2.GaussianBlur(face, (0, 0), size / 60)
+
+
+def synthetic_faces(count, size, seed):
+    """چهره ترسیمی افراد 1 تا count مدل مصنوعی؛ فهرست به ترتیب لیبل"""
+    rng = np.random.default_rng(seed)
+    return [synthetic_face(size, rng) for _ in range(count)]
+
+
+class SyntheticCapture(PacedSource):
+    """
+    مولد فریم مصنوعی با رابط VideoCapture: پس‌زمینه نویزی ثابت، چهره‌های ثابت faces (تصاویر خاکستری)
+    و یک مستطیل متحرک (برای فعال شدن دروازه حرکت). فریم‌ها یک‌بار ساخته می‌شوند و هر read() یک کپی برمی‌گرداند.
+    """
+    def __init__(self, width=1280, height=720, fps=25, frames=50, seed=0, faces=()):
+        super().__init__(fps)
+        rng = np.random.default_rng(seed)
+        background = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+        # چهره‌ها در یک ردیف زیر مسیر مستطیل متحرک قرار می‌گیرند
+        for i, face in enumerate(faces):
+            h, w = face.shape[:2]
+            x = (i + 1) * width // (len(faces) + 1) - w // 2
+            y = min(height - h, height * 3 // 5)
+            background[y:y + h, x:x + w] = face[:, :, None]
+        size = min(width, height) // 5
+        self._frames = []
+        for i in range(frames):
+            frame = background.copy()
+            x = (width - size) * i // max(1, frames - 1)
+            cv2.rectangle(frame, (x, height // 3), (x + size, height // 3 + size), (200, 200, 200), -1)
+            self._frames.append(frame)
+        self._index = 0
+
+    def read(self):
+        self._pace()
+        frame = self._frames[self._index]
+        self._index = (self._index + 1) % len(self._frames)
+        return True, frame.copy()
+
+
+class VideoFileCapture(PacedSource):
+    """بازپخش یک فایل ویدیویی محلی با نرخ ثابت؛ پس از پایان فایل از ابتدا تکرار می‌شود"""
+    def __init__(self, path, fps=25):
+        super().__init__(fps)
+        self._cap = cv2.VideoCapture(path)
+
+    def isOpened(self):
+        return self._cap.isOpened()
+
+    def read(self):
+        self._pace()
+        ret, frame = self._cap.read()
+        if not ret:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self._cap.read()
+        return ret, frame
+
+    def release(self):
+        self._cap.release()
+
+
+class MemoryCursor:
+    def __init__(self, database):
+        self.database = database
+
+    def execute(self, query, params=None):
+        pass
+
+    def executemany(self, query, rows):
+        if self.database.latency:
+            time.sleep(self.database.latency)
+        with self.database.lock:
+            self.database.rows += len(rows)
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+
+class MemoryDatabase:
+    """
+    جایگزین درون‌حافظه‌ای اتصال MySQL برای AttendanceWriter؛ ردیف‌های نوشته‌شده فقط شمرده می‌شوند.
+    latency: تأخیر شبیه‌سازی‌شده هر executemany (ثانیه)
+    """
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.rows = 0
+        self.commits = 0
+
+    def connect(self, **db_config):
+        return self
+
+    def cursor(self):
+        return MemoryCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class BenchmarkManager(CameraManager):
+    """
+    CameraManager با ثبت تأخیر پردازش هر فریم برای محاسبه صدک‌ها.
+    انتظار منبع برای رعایت نرخ فریم جزو تأخیر نیست و جداگانه در pacing_waits ثبت می‌شود.
+    """
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.latencies = []
+        self.pacing_waits = []
+        self.recording = False
+
+    def capture_frame(self, cam, face_cascade=None):
+        start = time.perf_counter()
+        _paced.ready = None
+        frame = super().capture_frame(cam, face_cascade)
+        end = time.perf_counter()
+        if frame is not None and self.recording:
+            ready = _paced.ready if _paced.ready is not None else start
+            # list.append در CPython اتمیک است
+            self.latencies.append(end - ready)
+            self.pacing_waits.append(ready - start)
+        return frame
+
+
+def enrollment_sample(face, cascade, preprocessor, seed):
+    """
+    نمونه آموزشی یک چهره ترسیمی از همان مسیر دوربین‌ها: قرار دادن در فریم نویزی، یکسان‌سازی،
+    تشخیص Haar و نرمال‌سازی مستطیل تشخیص‌داده‌شده (در صورت عدم تشخیص، نرمال‌سازی خود چهره)
+    """
+    h, w = face.shape[:2]
+    canvas = np.random.default_rng(seed).integers(0, 256, size=(h * 3, w * 3), dtype=np.uint8)
+    canvas[h:2 * h, w:2 * w] = face
+    gray = cv2.equalizeHist(canvas)
+    boxes = cascade.detectMultiScale(gray, scaleFactor=1.3, minNeighbors=5)
+    if len(boxes) == 0:
+        return preprocessor.normalize([face])[0]
+    return preprocessor.prepare(gray, [tuple(boxes[0])])[0]
+
+
+def build_model(workdir, faces, seed):
+    """ساخت مدل LBPH از چهره‌های ترسیمی (لیبل i+1 برای faces[i])؛ خروجی مسیر مدل"""
+    cascade = cv2.CascadeClassifier(FACE_CASCADE_PATH)
+    preprocessor = FacePreprocessor()
+    store = FaceModelStore(
+        model_path=os.path.join(workdir, "model.xml"),
+        labels_path=os.path.join(workdir, "labels.json"),
+    )
+    store.add_identities([
+        (label, f"first{label} last{label}", enrollment_sample(face, cascade, preprocessor, seed + label))
+        for label, face in enumerate(faces, start=1)
+    ])
+    store.flush()
+    return store.model_path
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def rss_mb():
+    """حافظه RSS فعلی پروسه (مگابایت)؛ در صورت نبود /proc، بیشینه RSS"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def process_cpu_seconds(pid):
+    """زمان CPU یک پروسه در حال اجرا از /proc/<pid>/stat (utime و stime)"""
+    with open(f"/proc/{pid}/stat") as stat:
+        # نام پروسه داخل پرانتز ممکن است فاصله داشته باشد؛ فیلدهای 14 و 15 پس از آن شمرده می‌شوند
+        fields = stat.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def cpu_seconds(pids=()):
+    """
+    زمان CPU این پروسه به همراه پروسه‌های کاری pids (استخر تشخیص) که هنوز در حال اجرا هستند.
+    بدون /proc فقط زمان همین پروسه شمرده می‌شود.
+    """
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    total = usage.ru_utime + usage.ru_stime
+    for pid in pids:
+        try:
+            total += process_cpu_seconds(pid)
+        except (OSError, ValueError, IndexError):
+            pass
+    return total
+
+
+def run(num_cameras, args, model_path, workdir, faces):
+    database = MemoryDatabase(latency=args.db_latency / 1000)
+    # spool در پوشه موقت؛ spool واقعی پوشه برنامه نباید در دیتابیس درون‌حافظه‌ای بازپخش و حذف شود
+    manager = BenchmarkManager(
+        threaded=True, detection_workers=args.detection_workers, model_path=model_path,
+        redis_config=None, db_connect=database.connect,
+        spool_path=os.path.join(workdir, f"attendance_spool_{num_cameras}.jsonl")
+    )
+    if not args.render:
+        manager.render_check = lambda: False
+
+    for i in range(num_cameras):
+        if args.videos:
+            path = args.videos[i % len(args.videos)]
+            opener = lambda source, path=path: VideoFileCapture(path, args.fps)
+        else:
+            camera_faces = [faces[(i * args.faces_per_camera + j) % len(faces)]
+                            for j in range(args.faces_per_camera)] if faces else []
+            opener = lambda source, seed=i, camera_faces=camera_faces: SyntheticCapture(
+                args.width, args.height, args.fps, seed=seed, faces=camera_faces
+            )
+        manager.add_camera(
+            f"cam{i}", f"bench://cam{i}", f"location{i}",
+            tracking={'detect_interval': 10} if args.tracking else None,
+            detection_gate={'motion_threshold': 0.002} if args.gate else None,
+            detection_profile={'scale': args.scale},
+            stream={'opener': opener}
+        )
+
+    manager.wait_for_cameras(timeout=10)
+    manager.start_workers()
+    pids = [worker.pid for worker in manager.detection_pool.workers] if manager.detection_pool is not None else []
+    try:
+        time.sleep(args.warmup)
+        manager.latencies = []
+        manager.pacing_waits = []
+        manager.recording = True
+        # بارگذاری مدل و گرم شدن پروسه‌های استخر پیش از نمونه شروع است و خاموش‌سازی پس از نمونه پایان
+        cpu_start, wall_start = cpu_seconds(pids), time.monotonic()
+        time.sleep(args.duration)
+        manager.recording = False
+        cpu = cpu_seconds(pids) - cpu_start
+        wall = time.monotonic() - wall_start
+        latencies = sorted(manager.latencies)
+        pacing_waits = list(manager.pacing_waits)
+        memory = rss_mb()
+    finally:
+        manager.stop_workers()
+        if manager.detection_pool is not None:
+            manager.detection_pool.close()
+        for cam in manager.cameras:
+            cam['stream'].release()
+        manager.evict_presence(everything=True)
+        manager.attendance_writer.stop()
+        manager.identity_cache.stop_listener()
+
+    return {
+        'cameras': num_cameras,
+        'frames': len(latencies),
+        'fps': len(latencies) / wall,
+        'fps_per_camera': len(latencies) / wall / num_cameras,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p90_ms': percentile(latencies, 90) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'pacing_wait_ms': sum(pacing_waits) / len(pacing_waits) * 1000 if pacing_waits else 0.0,
+        'cpu_percent': cpu / wall * 100,
+        'rss_mb': memory,
+        'db_rows': database.rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="بنچمارک بازپخش خط پردازش دوربین‌ها")
+    parser.add_argument("--cameras", type=int, nargs="+", default=[1, 4, 16], help="تعداد دوربین‌های شبیه‌سازی‌شده")
+    parser.add_argument("--videos", nargs="*", default=None, help="فایل‌های ویدیویی؛ در غیر این صورت فریم مصنوعی")
+    parser.add_argument("--fps", type=float, default=25, help="نرخ فریم هر منبع؛ 0 یعنی با حداکثر سرعت")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--duration", type=float, default=20, help="مدت اندازه‌گیری هر اجرا (ثانیه)")
+    parser.add_argument("--warmup", type=float, default=3, help="مدت گرم شدن پیش از اندازه‌گیری (ثانیه)")
+    parser.add_argument("--detection-workers", type=int, default=0)
+    parser.add_argument("--tracking", action="store_true", help="فعال‌سازی حالت ردیابی")
+    parser.add_argument("--gate", action="store_true", help="فعال‌سازی دروازه حرکت")
+    parser.add_argument("--scale", type=float, default=1.0, help="مقیاس پروفایل تشخیص")
+    parser.add_argument("--render", action="store_true", help="حاشیه‌نویسی فریم‌ها مثل حالت گرافیکی")
+    parser.add_argument("--db-latency", type=float, default=0.0, help="تأخیر شبیه‌سازی‌شده هر نوشتن دیتابیس (میلی‌ثانیه)")
+    parser.add_argument("--model", default=None, help="مسیر مدل LBPH؛ در غیر این صورت مدل مصنوعی ساخته می‌شود")
+    parser.add_argument("--identities", type=int, default=50, help="تعداد افراد مدل مصنوعی")
+    parser.add_argument("--faces-per-camera", type=int, default=2,
+                        help="تعداد چهره ترسیمی در فریم‌های مصنوعی هر دوربین؛ 0 یعنی بدون چهره")
+    parser.add_argument("--face-size", type=int, default=120, help="اندازه چهره‌های ترسیمی (پیکسل)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="ذخیره نتایج به صورت JSON برای مقایسه اجراها")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        faces = synthetic_faces(args.identities, args.face_size, args.seed)
+        model_path = args.model or build_model(workdir, faces, args.seed)
+        print(f"{'cameras':>7} | {'fps':>8} | {'fps/cam':>7} | {'p50 ms':>7} | {'p90 ms':>7} | "
+              f"{'p99 ms':>7} | {'wait ms':>7} | {'cpu %':>6} | {'rss MB':>7} | {'db rows':>7}")
+        for num_cameras in args.cameras:
+            result = run(num_cameras, args, model_path, workdir, faces if args.faces_per_camera else [])
+            results.append(result)
+            print(f"{num_cameras:>7} | {result['fps']:>8.1f} | {result['fps_per_camera']:>7.1f} | "
+                  f"{result['p50_ms']:>7.1f} | {result['p90_ms']:>7.1f} | {result['p99_ms']:>7.1f} | "
+                  f"{result['pacing_wait_ms']:>7.1f} | {result['cpu_percent']:>6.0f} | {result['rss_mb']:>7.0f} | "
+                  f"{result['db_rows']:>7}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'results': results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+بنچمارک دقت و سرعت پیش‌پردازش چهره: مسیرهای قدیمی در برابر FacePreprocessor مشترک.
+  - legacy:        ثبت‌نام با برش 200x200 بدون یکسان‌سازی و تغییر اندازه دوباره به 100x100؛
+                   شناسایی با predict روی ناحیه با اندازه متغیر از فریم یکسان‌سازی‌شده
+  - shared:        ثبت‌نام و شناسایی هر دو با FacePreprocessor (100x100 و یکسان‌سازی هیستوگرام هر چهره)
+  - shared+align:  همان به همراه هم‌ترازی چشم‌ها
+
+تصاویر باید در پوشه‌های جداگانه برای هر فرد باشند: dataset/<person>/*.jpg
+از هر فرد --enroll تصویر اول برای آموزش و بقیه برای آزمون استفاده می‌شوند.
+دقت (نسبت پیش‌بینی‌های درست) و نسبت پیش‌بینی‌های درست با confidence کمتر از 100 (آستانه ثبت حضور)
+به همراه زمان پیش‌پردازش و predict هر چهره گزارش می‌شود. در پایان یکسان‌سازی برداری دسته‌ای با
+cv2.equalizeHist روی تک‌تک چهره‌ها مقایسه می‌شود.
+
+اجرا:
+    python benchmark_preprocess.py dataset/ --enroll 3 --batch-sizes 1 4 16
+"""
+import argparse
+import os
+import time
+
+import cv2
+import numpy as np
+
+from face_preprocess import FacePreprocessor, equalize_batch
+from model_store import FACE_SIZE
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def load_dataset(directory, cascade):
+    """خواندن تصاویر هر فرد و تشخیص بزرگ‌ترین چهره؛ خروجی {label: [(gray, gray_equalized, box), ...]}"""
+    dataset = {}
+    for label, person in enumerate(sorted(os.listdir(directory)), start=1):
+        person_dir = os.path.join(directory, person)
+        if not os.path.isdir(person_dir):
+            continue
+        samples = []
+        for name in sorted(os.listdir(person_dir)):
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            image = cv2.imread(os.path.join(person_dir, name))
+            if image is None:
+                continue
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            equalized = cv2.equalizeHist(gray)
+            faces = cascade.detectMultiScale(equalized, scaleFactor=1.3, minNeighbors=5)
+            if len(faces) == 0:
+                continue
+            box = tuple(int(v) for v in max(faces, key=lambda f: f[2] * f[3]))
+            samples.append((gray, equalized, box))
+        if samples:
+            dataset[label] = samples
+    return dataset
+
+
+def legacy_enroll(gray, box):
+    x, y, w, h = box
+    face = cv2.resize(gray[y:y + h, x:x + w], (200, 200))
+    return cv2.resize(face, FACE_SIZE)
+
+
+def legacy_probe(equalized, box):
+    x, y, w, h = box
+    return equalized[y:y + h, x:x + w]
+
+
+def evaluate(dataset, enroll_count, enroll_fn, probe_fn):
+    train_faces, train_labels, probes = [], [], []
+    for label, samples in dataset.items():
+        for i, (gray, equalized, box) in enumerate(samples):
+            if i < enroll_count:
+                train_faces.append(enroll_fn(gray, box))
+                train_labels.append(label)
+            else:
+                probes.append((label, equalized, box))
+    if not probes:
+        raise SystemExit("هیچ تصویر آزمونی باقی نماند؛ --enroll را کم کنید یا تصاویر بیشتری اضافه کنید.")
+
+    recognizer = cv2.face.LBPHFaceRecognizer_create()
+    recognizer.train(train_faces, np.array(train_labels))
+
+    correct = accepted = 0
+    preprocess_time = predict_time = 0.0
+    for label, equalized, box in probes:
+        start = time.perf_counter()
+        face = probe_fn(equalized, box)
+        preprocess_time += time.perf_counter() - start
+        start = time.perf_counter()
+        predicted, confidence = recognizer.predict(face)
+        predict_time += time.perf_counter() - start
+        if predicted == label:
+            correct += 1
+            accepted += confidence < 100
+    n = len(probes)
+    return n, correct / n, accepted / n, preprocess_time / n * 1000, predict_time / n * 1000
+
+
+def benchmark_equalization(batch_sizes, repeats, rng):
+    print(f"\n{'faces':>6} | {'cv2 loop (ms)':>13} | {'batched (ms)':>12}")
+    for size in batch_sizes:
+        faces = rng.integers(0, 256, size=(size, FACE_SIZE[1], FACE_SIZE[0]), dtype=np.uint8)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            [cv2.equalizeHist(face) for face in faces]
+        loop_ms = (time.perf_counter() - start) / repeats * 1000
+        start = time.perf_counter()
+        for _ in range(repeats):
+            equalize_batch(faces)
+        batch_ms = (time.perf_counter() - start) / repeats * 1000
+        print(f"{size:>6} | {loop_ms:>13.3f} | {batch_ms:>12.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="بنچمارک دقت و سرعت پیش‌پردازش چهره")
+    parser.add_argument("dataset", help="پوشه تصاویر با یک زیرپوشه برای هر فرد")
+    parser.add_argument("--enroll", type=int, default=3, help="تعداد تصاویر آموزشی هر فرد")
+    parser.add_argument("--eye-cascade", default="assets/face_detection/haarcascade_eye.xml")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    dataset = load_dataset(args.dataset, cascade)
+    if not dataset:
+        parser.error("هیچ چهره‌ای در پوشه تصاویر یافت نشد.")
+
+    shared = FacePreprocessor(eye_cascade_path=args.eye_cascade)
+    aligned = FacePreprocessor(align=True, eye_cascade_path=args.eye_cascade)
+    paths = {
+        "legacy": (legacy_enroll, legacy_probe),
+        "shared": (lambda gray, box: shared.prepare(gray, [box])[0],
+                   lambda equalized, box: shared.prepare(equalized, [box])[0]),
+        "shared+align": (lambda gray, box: aligned.prepare(gray, [box])[0],
+                         lambda equalized, box: aligned.prepare(equalized, [box])[0]),
+    }
+
+    print(f"{len(dataset)} نفر، {args.enroll} تصویر آموزشی برای هر نفر")
+    print(f"{'path':>12} | {'probes':>6} | {'accuracy':>8} | {'accepted':>8} | {'prep ms':>7} | {'predict ms':>10}")
+    for name, (enroll_fn, probe_fn) in paths.items():
+        n, accuracy, accepted, prep_ms, predict_ms = evaluate(dataset, args.enroll, enroll_fn, probe_fn)
+        print(f"{name:>12} | {n:>6} | {accuracy:>8.1%} | {accepted:>8.1%} | {prep_ms:>7.3f} | {predict_ms:>10.3f}")
+
+    benchmark_equalization(args.batch_sizes, args.repeats, np.random.default_rng(args.seed))
+
+
+if __name__ == "__main__":
+    main()
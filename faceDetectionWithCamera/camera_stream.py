@@ -0,0 +1,146 @@
+import logging
+import threading
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+# وضعیت‌های سلامت جریان دوربین
+CONNECTING = "connecting"  # در حال اتصال (یا اتصال مجدد)
+LIVE = "live"  # فریم‌ها به درستی دریافت می‌شوند
+STALLED = "stalled"  # چند خواندن پیاپی ناموفق بوده؛ هنوز از همان اتصال خوانده می‌شود
+DEAD = "dead"  # چند تلاش پیاپی اتصال ناموفق بوده؛ تلاش مجدد با حداکثر فاصله ادامه دارد
+
+STATES = (CONNECTING, LIVE, STALLED, DEAD)
+
+
+class CameraStream:
+    """
+    مدیریت اتصال یک دوربین با اتصال مجدد خودکار:
+     - اتصال (و اتصال مجدد) در یک رشته پس‌زمینه انجام می‌شود، پس دوربین‌های در دسترس ناپذیر
+       راه‌اندازی یا حلقه پردازش دوربین‌های دیگر را معطل نمی‌کنند.
+     - تا وقتی جریان زنده نیست، read() بلافاصله (False, None) برمی‌گرداند.
+     - پس از stall_after خواندن ناموفق وضعیت stalled و پس از reconnect_after خواندن ناموفق،
+       اتصال بسته و اتصال مجدد با عقب‌نشینی نمایی (backoff_base تا backoff_max ثانیه) آغاز می‌شود.
+    opener: تابع سازنده منبع (پیش‌فرض cv2.VideoCapture)؛ برای فایل‌های محلی یا منابع ساختگی قابل جایگزینی است.
+    هر شیء با متدهای read()، isOpened() و release() به عنوان منبع قابل استفاده است.
+    """
+    def __init__(self, name, source, opener=None, stall_after=5, reconnect_after=30, backoff_base=1.0,
+                 backoff_max=60.0, dead_after_attempts=5, timeout_ms=5000):
+        self.name = name
+        self.source = source
+        self.opener = opener
+        self.stall_after = stall_after
+        self.reconnect_after = reconnect_after
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.dead_after_attempts = dead_after_attempts
+        self.timeout_ms = timeout_ms  # مهلت اتصال و خواندن برای جریان‌های شبکه‌ای
+        self.state = CONNECTING
+        self.failures = 0  # خواندن‌های ناموفق پیاپی
+        self.attempts = 0  # تلاش‌های اتصال ناموفق پیاپی
+        self.reconnects = 0
+        self._cap = None
+        self._lock = threading.Lock()
+        self._connecting = False
+        self._stop_event = threading.Event()
+        self._connected = threading.Event()
+
+    def _set_state(self, state):
+        if state != self.state:
+            logger.info(f"وضعیت دوربین '{self.name}': {self.state} -> {state}")
+            self.state = state
+
+    def _open(self):
+        if self.opener is not None:
+            return self.opener(self.source)
+        if isinstance(self.source, str) and "://" in self.source and hasattr(cv2, "CAP_PROP_OPEN_TIMEOUT_MSEC"):
+            # محدود کردن زمان مسدود شدن اتصال و خواندن جریان‌های RTSP/HTTP
+            return cv2.VideoCapture(self.source, cv2.CAP_FFMPEG, [
+                cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, self.timeout_ms,
+                cv2.CAP_PROP_READ_TIMEOUT_MSEC, self.timeout_ms
+            ])
+        return cv2.VideoCapture(self.source)
+
+    def connect_async(self):
+        """شروع اتصال در پس‌زمینه (اگر اتصالی در جریان نباشد)"""
+        with self._lock:
+            if self._connecting or self._stop_event.is_set():
+                return
+            self._connecting = True
+            self._connected.clear()
+            if self.state != DEAD:
+                self._set_state(CONNECTING)
+        threading.Thread(target=self._connect_loop, name=f"connect-{self.name}", daemon=True).start()
+
+    def _connect_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                cap = self._open()
+                opened = cap.isOpened()
+            except Exception as e:
+                logger.error(f"خطا در اتصال به دوربین '{self.name}': {e}")
+                cap, opened = None, False
+
+            if opened:
+                with self._lock:
+                    if self._stop_event.is_set():
+                        # release() در حین اتصال فراخوانی شده است
+                        self._connecting = False
+                        cap.release()
+                        return
+                    self._cap = cap
+                    self.failures = 0
+                    self.attempts = 0
+                    self._connecting = False
+                    self._set_state(LIVE)
+                self._connected.set()
+                return
+
+            if cap is not None:
+                cap.release()
+            self.attempts += 1
+            if self.attempts >= self.dead_after_attempts:
+                self._set_state(DEAD)
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (self.attempts - 1))
+            logger.warning(f"اتصال به دوربین '{self.name}' ناموفق بود؛ تلاش مجدد پس از {delay:.0f} ثانیه")
+            self._stop_event.wait(delay)
+
+        with self._lock:
+            self._connecting = False
+
+    def wait_connected(self, timeout=None):
+        return self._connected.wait(timeout)
+
+    def read(self):
+        """خواندن یک فریم؛ اگر جریان زنده نباشد بدون انتظار (False, None) برمی‌گرداند"""
+        with self._lock:
+            cap = self._cap if self.state in (LIVE, STALLED) else None
+        if cap is None:
+            return False, None
+
+        ret, frame = cap.read()
+        if ret:
+            if self.state != LIVE:
+                self._set_state(LIVE)
+            self.failures = 0
+            return True, frame
+
+        self.failures += 1
+        if self.failures >= self.reconnect_after:
+            with self._lock:
+                self._cap = None
+            cap.release()
+            self.reconnects += 1
+            self.connect_async()
+        elif self.failures >= self.stall_after:
+            self._set_state(STALLED)
+        return False, None
+
+    def release(self):
+        """توقف تلاش‌های اتصال و بستن منبع"""
+        self._stop_event.set()
+        with self._lock:
+            cap, self._cap = self._cap, None
+        if cap is not None:
+            cap.release()
@@ -0,0 +1,80 @@
+import cv2
+import numpy as np
+
+
+class DetectionGate:
+    """
+    دروازه تشخیص برای یک دوربین:
+     - rois: فهرست نواحی (x, y, w, h) در مختصات فریم پردازش‌شده که تشخیص فقط داخل آن‌ها انجام می‌شود (مثلاً درِ ورودی)
+     - تشخیص حرکت ارزان با تفاضل فریم کوچک‌شده نسبت به فریم مرجع (فریم آخرین تشخیص)؛
+       در فریم‌های ساکن تشخیص به طور کامل رد می‌شود و نتیجه تشخیص قبلی معتبر می‌ماند.
+    پس از max_skip_frames فریم ساکن، یک تشخیص اجباری انجام می‌شود تا نتیجه قدیمی نماند.
+    متریک‌ها: frames، skipped و skip_ratio
+    """
+    def __init__(self, rois=None, motion_threshold=0.002, pixel_threshold=25, max_skip_frames=150, scale=0.25):
+        self.rois = [tuple(int(v) for v in roi) for roi in rois] if rois else []
+        self.motion_threshold = motion_threshold  # حداقل نسبت پیکسل‌های تغییرکرده برای تشخیص حرکت
+        self.pixel_threshold = pixel_threshold  # حداقل اختلاف شدت روشنایی یک پیکسل برای تغییر محسوب شدن
+        self.max_skip_frames = max_skip_frames
+        self.scale = scale  # مقیاس فریم کوچک‌شده برای مقایسه
+        self._reference = None
+        self._mask = None
+        self._since_detection = 0
+        self.last_results = []  # نتیجه آخرین تشخیص که در فریم‌های ساکن دوباره استفاده می‌شود
+        self.frames = 0
+        self.skipped = 0
+
+    @property
+    def skip_ratio(self):
+        return self.skipped / self.frames if self.frames else 0.0
+
+    def _roi_mask(self, shape):
+        """ماسک نواحی ROI در مقیاس فریم کوچک‌شده (None اگر ROI تعریف نشده باشد)"""
+        if not self.rois:
+            return None
+        mask = np.zeros(shape, dtype=bool)
+        for x, y, w, h in self.rois:
+            x1, y1 = int(x * self.scale), int(y * self.scale)
+            x2, y2 = int((x + w) * self.scale) + 1, int((y + h) * self.scale) + 1
+            mask[y1:y2, x1:x2] = True
+        return mask if mask.any() else None
+
+    def should_detect(self, gray):
+        """
+        تصمیم‌گیری درباره اجرای تشخیص برای این فریم (gray پیش از equalizeHist).
+        اگر تشخیص انجام شود، این فریم مرجع مقایسه‌های بعدی می‌شود.
+        """
+        self.frames += 1
+        small = cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        small = cv2.GaussianBlur(small, (5, 5), 0)
+
+        detect = (self._reference is None or self._reference.shape != small.shape
+                  or self._since_detection >= self.max_skip_frames)
+        if not detect:
+            changed = cv2.absdiff(small, self._reference) > self.pixel_threshold
+            if self._mask is not None:
+                detect = changed[self._mask].mean() >= self.motion_threshold
+            else:
+                detect = changed.mean() >= self.motion_threshold
+
+        if detect:
+            if self._reference is None or self._reference.shape != small.shape:
+                self._mask = self._roi_mask(small.shape)
+            self._reference = small
+            self._since_detection = 0
+            return True
+        self.skipped += 1
+        self._since_detection += 1
+        return False
+
+    def regions(self, gray):
+        """تولید (x, y, crop) برای هر ROI؛ بدون ROI کل فریم برگردانده می‌شود"""
+        if not self.rois:
+            yield 0, 0, gray
+            return
+        height, width = gray.shape[:2]
+        for x, y, w, h in self.rois:
+            x1, y1 = max(0, x), max(0, y)
+            x2, y2 = min(width, x + w), min(height, y + h)
+            if x2 > x1 and y2 > y1:
+                yield x1, y1, gray[y1:y2, x1:x2]
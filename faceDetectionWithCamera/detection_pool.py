@@ -0,0 +1,206 @@
+import itertools
+import logging
+import multiprocessing as mp
+import os
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from face_preprocess import FacePreprocessor
+
+logger = logging.getLogger(__name__)
+
+# نوع عملیات هر درخواست
+OP_DETECT = "detect"  # فقط تشخیص چهره؛ خروجی: [(x, y, w, h), ...]
+OP_RECOGNIZE = "recognize"  # فقط شناسایی مستطیل‌های داده‌شده؛ خروجی: [(label, confidence), ...]
+OP_DETECT_RECOGNIZE = "detect_recognize"  # خروجی: [((x, y, w, h), label, confidence), ...]
+RESULT_TIMEOUT = 5.0  # حداکثر انتظار برای بافر آزاد و نتیجه هر درخواست (ثانیه)
+
+
+class DetectionPoolError(RuntimeError):
+    """خطای پروسه کاری یا پایان زمان انتظار؛ فراخوان باید تشخیص را درون پروسه خود انجام دهد"""
+
+
+def _worker_main(shm_names, max_shape, cascade_path, model_path, model_generation, tasks, results):
+    """
+    حلقه پروسه کاری: cascade و مدل فقط یک بار بارگذاری می‌شوند و فریم‌ها از بافرهای حافظه مشترک خوانده می‌شوند.
+    اگر model_generation تغییر کند، مدل قبل از درخواست بعدی دوباره خوانده می‌شود.
+    """
+    blocks = [shared_memory.SharedMemory(name=name) for name in shm_names]
+    buffers = [np.ndarray(max_shape, dtype=np.uint8, buffer=block.buf) for block in blocks]
+    face_cascade = cv2.CascadeClassifier(cascade_path)
+    preprocessor = FacePreprocessor()
+    recognizer = cv2.face.LBPHFaceRecognizer_create()
+    recognizer.read(model_path)
+    generation = model_generation.value
+
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            task_id, slot, h, w, op, boxes, detect_kwargs = task
+            try:
+                if model_generation.value != generation:
+                    generation = model_generation.value
+                    recognizer = cv2.face.LBPHFaceRecognizer_create()
+                    recognizer.read(model_path)
+
+                gray = buffers[slot][:h, :w]
+                if op != OP_RECOGNIZE:
+                    boxes = [tuple(int(v) for v in box)
+                             for box in face_cascade.detectMultiScale(gray, **detect_kwargs)]
+                if op == OP_DETECT:
+                    result = boxes
+                else:
+                    predictions = [recognizer.predict(face) for face in preprocessor.prepare(gray, boxes)]
+                    if op == OP_RECOGNIZE:
+                        result = predictions
+                    else:
+                        result = [(box, label, confidence) for box, (label, confidence) in zip(boxes, predictions)]
+                results.put((task_id, slot, result, None))
+            except Exception as e:
+                results.put((task_id, slot, None, str(e)))
+    finally:
+        del buffers
+        for block in blocks:
+            block.close()
+
+
+class DetectionPool:
+    """
+    موتور تشخیص/شناسایی چهره مبتنی بر چند پروسه.
+    هر پروسه کاری cascade و مدل LBPH را یک بار بارگذاری می‌کند. فریم خاکستری (هیستوگرام‌شده) در یکی از
+    بافرهای حافظه مشترک کپی می‌شود و فقط شماره بافر و ابعاد آن از طریق صف ارسال می‌شود (بدون pickle کردن آرایه).
+    submit یک Future برمی‌گرداند؛ اگر هر دوربین Futureهای خود را به ترتیب ارسال مصرف کند، ترتیب نتایج حفظ می‌شود.
+    تعداد بافرها سقف درخواست‌های در حال پردازش است و در صورت پر بودن، submit منتظر آزاد شدن بافر می‌ماند.
+    detect، recognize و detect_and_recognize حداکثر result_timeout ثانیه منتظر می‌مانند؛ اگر پروسه کاری گیر کرده
+    یا از کار افتاده باشد، بافر درخواست آزاد و DetectionPoolError پرتاب می‌شود تا رشته دوربین متوقف نماند.
+    """
+    def __init__(self, cascade_path, model_path, num_workers=None, num_slots=None, max_shape=(1080, 1920),
+                 detect_kwargs=None, result_timeout=RESULT_TIMEOUT):
+        self.result_timeout = result_timeout
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.num_slots = num_slots or self.num_workers * 2
+        self.max_shape = max_shape
+        self.detect_kwargs = detect_kwargs or {'scaleFactor': 1.3, 'minNeighbors': 5}
+
+        frame_bytes = max_shape[0] * max_shape[1]
+        self._blocks = [shared_memory.SharedMemory(create=True, size=frame_bytes) for _ in range(self.num_slots)]
+        self._buffers = [np.ndarray(max_shape, dtype=np.uint8, buffer=b.buf) for b in self._blocks]
+        self._free_slots = queue.Queue()
+        for slot in range(self.num_slots):
+            self._free_slots.put(slot)
+
+        ctx = mp.get_context("spawn")  # fork در کنار رشته‌های فعال ایمن نیست
+        self._tasks = ctx.Queue()
+        self._results = ctx.Queue()
+        self._model_generation = ctx.Value('i', 0)
+        self._futures = {}
+        self._futures_lock = threading.Lock()
+        self._ids = itertools.count()
+
+        self._workers = [
+            ctx.Process(
+                target=_worker_main,
+                args=([b.name for b in self._blocks], max_shape, cascade_path, model_path,
+                      self._model_generation, self._tasks, self._results),
+                name=f"detection-worker-{i}", daemon=True
+            )
+            for i in range(self.num_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+        self._collector = threading.Thread(target=self._collect, name="detection-collector", daemon=True)
+        self._collector.start()
+        logger.info(f"استخر تشخیص با {self.num_workers} پروسه کاری راه‌اندازی شد.")
+
+    def _collect(self):
+        """دریافت نتایج از پروسه‌ها، آزاد کردن بافر و تکمیل Future مربوطه"""
+        while True:
+            item = self._results.get()
+            if item is None:
+                return
+            task_id, slot, result, error = item
+            with self._futures_lock:
+                future = self._futures.pop(task_id, None)
+            if future is None:
+                # نتیجه دیرهنگام درخواستی که به پایان زمان رسیده؛ بافر آن در _wait آزاد شده است
+                continue
+            self._free_slots.put(slot)
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(DetectionPoolError(error))
+
+    def _submit(self, gray, op, boxes, detect_kwargs, timeout=None):
+        h, w = gray.shape[:2]
+        if h > self.max_shape[0] or w > self.max_shape[1]:
+            raise ValueError(f"ابعاد فریم ({w}x{h}) از حداکثر بافر حافظه مشترک بزرگ‌تر است.")
+        try:
+            slot = self._free_slots.get(timeout=timeout)
+        except queue.Empty:
+            raise DetectionPoolError(f"هیچ بافر آزادی پس از {timeout} ثانیه در استخر تشخیص نبود.")
+        self._buffers[slot][:h, :w] = gray
+
+        task_id = next(self._ids)
+        future = Future()
+        with self._futures_lock:
+            self._futures[task_id] = future
+        self._tasks.put((task_id, slot, h, w, op, boxes, detect_kwargs or self.detect_kwargs))
+        return task_id, slot, future
+
+    def submit(self, gray, op=OP_DETECT_RECOGNIZE, boxes=None, detect_kwargs=None):
+        """ارسال یک فریم خاکستری به استخر؛ خروجی Future با نتیجه متناسب با op"""
+        return self._submit(gray, op, boxes, detect_kwargs)[2]
+
+    def _run(self, gray, op, boxes=None, detect_kwargs=None):
+        """ارسال و انتظار حداکثر result_timeout ثانیه برای نتیجه؛ در صورت پایان زمان، بافر درخواست آزاد می‌شود"""
+        task_id, slot, future = self._submit(gray, op, boxes, detect_kwargs, self.result_timeout)
+        try:
+            return future.result(timeout=self.result_timeout)
+        except FutureTimeoutError:
+            with self._futures_lock:
+                abandoned = self._futures.pop(task_id, None) is not None
+            if not abandoned:
+                # نتیجه همزمان با پایان زمان رسیده و _collect بافر را آزاد کرده است
+                return future.result()
+            self._free_slots.put(slot)
+            raise DetectionPoolError(f"نتیجه استخر تشخیص پس از {self.result_timeout} ثانیه دریافت نشد.")
+
+    def detect(self, gray, detect_kwargs=None):
+        return self._run(gray, OP_DETECT, detect_kwargs=detect_kwargs)
+
+    def recognize(self, gray, boxes):
+        return self._run(gray, OP_RECOGNIZE, boxes=boxes)
+
+    def detect_and_recognize(self, gray, detect_kwargs=None):
+        return self._run(gray, OP_DETECT_RECOGNIZE, detect_kwargs=detect_kwargs)
+
+    @property
+    def workers(self):
+        """پروسه‌های کاری استخر (برای پایش مصرف منابع)"""
+        return list(self._workers)
+
+    def reload_model(self):
+        """اعلام تغییر مدل به پروسه‌های کاری؛ هر پروسه پیش از درخواست بعدی مدل را دوباره می‌خواند"""
+        with self._model_generation.get_lock():
+            self._model_generation.value += 1
+
+    def close(self):
+        for _ in self._workers:
+            self._tasks.put(None)
+        for worker in self._workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        self._results.put(None)
+        self._collector.join(timeout=5)
+        del self._buffers
+        for block in self._blocks:
+            block.close()
+            block.unlink()
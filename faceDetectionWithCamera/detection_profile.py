@@ -0,0 +1,76 @@
+import cv2
+
+
+def iou(a, b):
+    """نسبت همپوشانی دو مستطیل (x, y, w, h)"""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union else 0.0
+
+
+class DetectionProfile:
+    """
+    پروفایل تشخیص چهره برای یک دوربین یا سرور:
+     - scale: تشخیص روی نسخه کوچک‌شده تصویر انجام می‌شود و مستطیل‌ها به وضوح اصلی برگردانده می‌شوند
+       تا شناسایی روی تصویر با کیفیت کامل انجام شود.
+     - max_dimension: در صورت تعیین، تصویر طوری کوچک می‌شود که ضلع بزرگ‌تر از این مقدار بیشتر نباشد.
+     - min_size و max_size: محدوده اندازه چهره (پیکسل، در وضوح اصلی) تا cascade مقیاس‌های بی‌فایده را بررسی نکند.
+    مقادیر پیش‌فرض معادل تنظیمات قبلی (scaleFactor=1.3، minNeighbors=5 روی تصویر کامل) است.
+    """
+    def __init__(self, scale=1.0, scale_factor=1.3, min_neighbors=5, min_size=None, max_size=None,
+                 max_dimension=None):
+        self.scale = scale
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = tuple(min_size) if min_size else None
+        self.max_size = tuple(max_size) if max_size else None
+        self.max_dimension = max_dimension
+
+    @classmethod
+    def from_mounting(cls, min_distance, max_distance, focal_px=600, face_width=0.16, **kwargs):
+        """
+        ساخت پروفایل از فاصله نصب دوربین:
+        اندازه چهره در تصویر تقریباً focal_px * face_width / distance پیکسل است؛
+        نزدیک‌ترین فاصله بزرگ‌ترین چهره و دورترین فاصله کوچک‌ترین چهره را تعیین می‌کند (با ۲۵٪ حاشیه).
+        """
+        min_face = max(1, int(focal_px * face_width / max_distance * 0.75))
+        max_face = max(min_face + 1, int(focal_px * face_width / min_distance * 1.25))
+        return cls(min_size=(min_face, min_face), max_size=(max_face, max_face), **kwargs)
+
+    def scale_for(self, gray):
+        scale = self.scale
+        if self.max_dimension:
+            scale = min(scale, self.max_dimension / max(gray.shape[:2]))
+        return min(scale, 1.0)
+
+    def prepare(self, gray):
+        """برگرداندن (تصویر آماده تشخیص، مقیاس)"""
+        scale = self.scale_for(gray)
+        if scale >= 1.0:
+            return gray, 1.0
+        return cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA), scale
+
+    def detect_kwargs(self, scale=1.0):
+        """پارامترهای detectMultiScale برای تصویری با مقیاس داده‌شده"""
+        kwargs = {'scaleFactor': self.scale_factor, 'minNeighbors': self.min_neighbors}
+        if self.min_size:
+            kwargs['minSize'] = tuple(max(1, int(v * scale)) for v in self.min_size)
+        if self.max_size:
+            kwargs['maxSize'] = tuple(max(1, int(v * scale)) for v in self.max_size)
+        return kwargs
+
+    @staticmethod
+    def map_back(faces, scale):
+        """تبدیل مستطیل‌های تشخیص‌داده‌شده روی تصویر کوچک به مختصات وضوح اصلی"""
+        if scale == 1.0:
+            return [tuple(int(v) for v in face) for face in faces]
+        return [tuple(int(round(v / scale)) for v in face) for face in faces]
+
+    def detect(self, cascade, gray):
+        """تشخیص چهره با این پروفایل و برگرداندن مستطیل‌ها در وضوح اصلی"""
+        image, scale = self.prepare(gray)
+        return self.map_back(cascade.detectMultiScale(image, **self.detect_kwargs(scale)), scale)
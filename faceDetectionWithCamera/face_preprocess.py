@@ -0,0 +1,115 @@
+"""
+پیش‌پردازش مشترک چهره برای ثبت‌نام (server.py) و شناسایی (CameraManager و DetectionPool).
+هر دو مسیر چهره را به یک شکل نرمال می‌کنند: برش، هم‌ترازی اختیاری چشم‌ها، تغییر اندازه به FACE_SIZE
+و یکسان‌سازی هیستوگرام هر چهره، تا مدل LBPH روی همان نوع تصویری آموزش ببیند که بعداً با آن مقایسه می‌کند.
+چهره‌های یک فریم به صورت دسته‌ای در یک آرایه (N, h, w) آماده می‌شوند و یکسان‌سازی هیستوگرام روی کل دسته
+به صورت برداری با numpy انجام می‌شود.
+"""
+import math
+import threading
+
+import cv2
+import numpy as np
+
+from model_store import FACE_SIZE
+
+EYE_CASCADE_PATH = cv2.data.haarcascades + 'haarcascade_eye.xml'
+EQUALIZE = True  # یکسان‌سازی هیستوگرام هر چهره
+ALIGN_EYES = False  # چرخش چهره بر اساس خط چشم‌ها (هزینه یک تشخیص چشم برای هر چهره)
+
+
+def equalize_batch(faces):
+    """
+    یکسان‌سازی هیستوگرام یک دسته چهره (N, h, w) از نوع uint8 با یک محاسبه برداری
+    (هم‌ارز cv2.equalizeHist روی تک‌تک چهره‌ها).
+    """
+    n = faces.shape[0]
+    if n == 0:
+        return faces
+    flat = faces.reshape(n, -1)
+    offsets = (np.arange(n, dtype=np.int64) * 256)[:, None]
+    hist = np.bincount((flat + offsets).ravel(), minlength=n * 256).reshape(n, 256)
+    cdf = hist.cumsum(axis=1)
+    # تعداد پیکسل‌های کم‌نورترین سطح موجود در هر چهره
+    cdf_min = hist[np.arange(n), (hist > 0).argmax(axis=1)][:, None]
+    denominator = flat.shape[1] - cdf_min
+    uniform = denominator[:, 0] == 0
+    lut = np.rint((cdf - cdf_min) * (255.0 / np.maximum(denominator, 1)))
+    lut = np.clip(lut, 0, 255).astype(np.uint8)
+    # چهره یکنواخت (فقط یک سطح روشنایی) بدون تغییر می‌ماند
+    lut[uniform] = np.arange(256, dtype=np.uint8)
+    return np.take_along_axis(lut, flat.astype(np.intp), axis=1).reshape(faces.shape)
+
+
+class FacePreprocessor:
+    """
+    نرمال‌سازی چهره‌ها به اندازه size با یکسان‌سازی هیستوگرام و هم‌ترازی اختیاری چشم‌ها.
+    CascadeClassifier بین رشته‌ها ایمن نیست، پس cascade چشم برای هر رشته جداگانه ساخته می‌شود
+    و یک نمونه از این کلاس بین رشته‌های دوربین قابل اشتراک است.
+    """
+    def __init__(self, size=FACE_SIZE, equalize=EQUALIZE, align=ALIGN_EYES, eye_cascade_path=EYE_CASCADE_PATH):
+        self.size = size  # (عرض، ارتفاع)
+        self.equalize = equalize
+        self.align = align
+        self.eye_cascade_path = eye_cascade_path
+        self._local = threading.local()
+
+    def eye_cascade(self):
+        cascade = getattr(self._local, "eye_cascade", None)
+        if cascade is None:
+            cascade = self._local.eye_cascade = cv2.CascadeClassifier(self.eye_cascade_path)
+        return cascade
+
+    def find_eyes(self, face):
+        """تشخیص چشم‌ها در تصویر خاکستری یک چهره؛ خروجی مستطیل‌های (x, y, w, h)"""
+        return self.eye_cascade().detectMultiScale(face)
+
+    def align_face(self, face, eyes=None):
+        """
+        چرخش چهره به گونه‌ای که خط واصل دو چشم افقی شود.
+        فقط چشم‌های نیمه بالایی چهره در نظر گرفته می‌شوند؛ اگر دو چشم یافت نشود، چهره بدون تغییر برمی‌گردد.
+        """
+        if eyes is None:
+            eyes = self.find_eyes(face)
+        h, w = face.shape[:2]
+        eyes = sorted((e for e in eyes if e[1] + e[3] / 2 < h / 2), key=lambda e: e[2] * e[3], reverse=True)[:2]
+        if len(eyes) < 2:
+            return face
+        (lx, ly), (rx, ry) = sorted((x + ew / 2, y + eh / 2) for x, y, ew, eh in eyes)
+        angle = math.degrees(math.atan2(ry - ly, rx - lx))
+        if abs(angle) < 1:
+            return face
+        rotation = cv2.getRotationMatrix2D(((lx + rx) / 2, (ly + ry) / 2), angle, 1.0)
+        return cv2.warpAffine(face, rotation, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+    def _normalize_into(self, batch, crops, eyes=None):
+        for i, crop in enumerate(crops):
+            if self.align:
+                crop = self.align_face(crop, eyes[i] if eyes is not None else None)
+            if crop.shape[:2] == batch.shape[1:]:
+                batch[i] = crop
+            else:
+                cv2.resize(crop, self.size, dst=batch[i], interpolation=cv2.INTER_AREA)
+        return equalize_batch(batch) if self.equalize else batch
+
+    def prepare(self, gray, boxes):
+        """
+        برش و نرمال‌سازی همه چهره‌های یک فریم خاکستری.
+        خروجی آرایه (N, h, w) به ترتیب boxes؛ مستطیل‌ها به محدوده تصویر محدود می‌شوند.
+        """
+        batch = np.empty((len(boxes), self.size[1], self.size[0]), dtype=np.uint8)
+        height, width = gray.shape[:2]
+        crops = []
+        for (x, y, w, h) in boxes:
+            x1, y1 = max(0, int(x)), max(0, int(y))
+            x2, y2 = min(width, int(x + w)), min(height, int(y + h))
+            crops.append(gray[y1:max(y2, y1 + 1), x1:max(x2, x1 + 1)])
+        return self._normalize_into(batch, crops)
+
+    def normalize(self, faces, eyes=None):
+        """
+        نرمال‌سازی چهره‌های از پیش برش‌خورده (مثلاً نمونه‌های ذخیره‌شده در Redis)؛ خروجی (N, h, w)
+        eyes: چشم‌های از قبل تشخیص‌داده‌شده هر چهره (در مختصات همان چهره) تا تشخیص چشم تکرار نشود
+        """
+        batch = np.empty((len(faces), self.size[1], self.size[0]), dtype=np.uint8)
+        return self._normalize_into(batch, faces, eyes)
@@ -0,0 +1,171 @@
+"""
+مخزن فشرده نمونه‌های چهره در Redis.
+هر چهره به صورت بایت‌های خام خاکستری 100x100 (همان اندازه‌ای که مدل با آن آموزش می‌بیند) ذخیره می‌شود:
+  face:sample:<national_code>  -> 10000 بایت خام
+  face:names                   -> hash: national_code -> JSON شامل firstName، lastName و detectionTime
+  face:index                   -> set کدهای ملی ثبت‌شده
+بارگذاری مجموعه آموزشی با چند MGET دسته‌ای انجام می‌شود و هیچ مرحله رمزگشایی (Base64/JPEG) ندارد.
+
+مهاجرت کلیدهای قدیمی (JSON + Base64 + JPEG با کد ملی به عنوان کلید):
+    python face_store.py migrate [--delete-legacy]
+تا وقتی کلید قدیمی منتقل‌نشده‌ای وجود دارد، require_migrated خطا می‌دهد تا آموزش کامل مدل
+افراد ثبت‌نام‌شده پیش از مهاجرت را حذف نکند.
+"""
+import argparse
+import base64
+import json
+import logging
+
+import cv2
+import numpy as np
+import redis
+from persiantools.jdatetime import JalaliDateTime
+
+from model_store import FACE_SIZE
+
+SAMPLE_PREFIX = "face:sample:"
+NAMES_KEY = "face:names"
+INDEX_KEY = "face:index"
+
+
+class UnmigratedSamplesError(RuntimeError):
+    """کلیدهای قدیمی منتقل‌نشده در Redis وجود دارند و load_all همه افراد را برنمی‌گرداند"""
+
+
+class FaceSampleStore:
+    """خواندن و نوشتن نمونه‌های چهره؛ redis_client باید با decode_responses=False ساخته شده باشد"""
+    def __init__(self, redis_client, batch_size=500):
+        self.redis = redis_client
+        self.batch_size = batch_size  # تعداد کلید در هر MGET
+
+    @staticmethod
+    def to_sample(face_image):
+        """تبدیل چهره به بایت‌های خام خاکستری 100x100"""
+        if face_image.ndim == 3:
+            face_image = cv2.cvtColor(face_image, cv2.COLOR_BGR2GRAY)
+        if face_image.shape[:2] != (FACE_SIZE[1], FACE_SIZE[0]):
+            face_image = cv2.resize(face_image, FACE_SIZE)
+        return np.ascontiguousarray(face_image, dtype=np.uint8).tobytes()
+
+    def save_many(self, people):
+        """ذخیره دسته‌ای افراد (national_code, first_name, last_name, face) با یک pipeline"""
+        detection_time = JalaliDateTime.now().strftime('%Y-%m-%d %H:%M:%S')
+        pipe = self.redis.pipeline(transaction=False)
+        for national_code, first_name, last_name, face_image in people:
+            pipe.set(SAMPLE_PREFIX + str(national_code), self.to_sample(face_image))
+            pipe.hset(NAMES_KEY, str(national_code), json.dumps({
+                "firstName": first_name,
+                "lastName": last_name,
+                "detectionTime": detection_time
+            }, ensure_ascii=False))
+            pipe.sadd(INDEX_KEY, str(national_code))
+        pipe.execute()
+
+    def save(self, national_code, first_name, last_name, face_image):
+        self.save_many([(national_code, first_name, last_name, face_image)])
+
+    def unmigrated_codes(self):
+        """کدهای ملی کلیدهای قدیمی (کلید عددی) که هنوز در face:index ثبت نشده‌اند"""
+        codes = [key for key in self.redis.scan_iter(count=1000) if key.isdigit()]
+        unmigrated = []
+        for i in range(0, len(codes), self.batch_size):
+            chunk = codes[i:i + self.batch_size]
+            pipe = self.redis.pipeline(transaction=False)
+            for code in chunk:
+                pipe.sismember(INDEX_KEY, code)
+            unmigrated.extend(code.decode() for code, indexed in zip(chunk, pipe.execute()) if not indexed)
+        return unmigrated
+
+    def require_migrated(self):
+        """خطای UnmigratedSamplesError اگر کلید قدیمی منتقل‌نشده‌ای وجود داشته باشد"""
+        unmigrated = self.unmigrated_codes()
+        if unmigrated:
+            raise UnmigratedSamplesError(
+                f"{len(unmigrated)} رکورد چهره با قالب قدیمی منتقل نشده است؛ "
+                f"ابتدا python face_store.py migrate را اجرا کنید."
+            )
+
+    def load_all(self):
+        """
+        بارگذاری کل مجموعه آموزشی.
+        خروجی: (faces با شکل (N, 100, 100)، labels، labels_to_name)
+        """
+        codes = sorted(code.decode() for code in self.redis.smembers(INDEX_KEY))
+        names = {k.decode(): json.loads(v) for k, v in self.redis.hgetall(NAMES_KEY).items()}
+
+        samples = []
+        for i in range(0, len(codes), self.batch_size):
+            chunk = codes[i:i + self.batch_size]
+            samples.extend(self.redis.mget([SAMPLE_PREFIX + code for code in chunk]))
+
+        sample_size = FACE_SIZE[0] * FACE_SIZE[1]
+        valid = [(code, sample) for code, sample in zip(codes, samples)
+                 if sample is not None and len(sample) == sample_size]
+        faces = np.frombuffer(b"".join(sample for _, sample in valid), dtype=np.uint8)
+        faces = faces.reshape(len(valid), FACE_SIZE[1], FACE_SIZE[0])
+
+        labels = [int(code) for code, _ in valid]
+        labels_to_name = {}
+        for code, _ in valid:
+            data = names.get(code, {})
+            labels_to_name[int(code)] = {
+                "full_name": f"{data.get('firstName', '')} {data.get('lastName', '')}".strip(),
+                "student_id": code
+            }
+        return faces, labels, labels_to_name
+
+
+def migrate_legacy(store, delete_legacy=False):
+    """
+    تبدیل کلیدهای قدیمی (کد ملی -> JSON با تصویر JPEG/Base64) به قالب جدید.
+    خروجی: تعداد رکوردهای منتقل‌شده
+    """
+    client = store.redis
+    migrated = 0
+    batch, legacy_keys = [], []
+    for key in client.scan_iter(count=1000):
+        if not key.isdigit():
+            continue
+        try:
+            data = json.loads(client.get(key))
+            np_arr = np.frombuffer(base64.b64decode(data['faceImage']), np.uint8)
+            face_image = cv2.imdecode(np_arr, cv2.IMREAD_GRAYSCALE)
+        except (ValueError, KeyError, TypeError) as e:
+            logging.warning(f"رکورد {key!r} قابل تبدیل نیست: {e}")
+            continue
+        if face_image is None:
+            continue
+        batch.append((key.decode(), data.get('firstName', ''), data.get('lastName', ''), face_image))
+        legacy_keys.append(key)
+        if len(batch) >= store.batch_size:
+            store.save_many(batch)
+            migrated += len(batch)
+            batch = []
+
+    if batch:
+        store.save_many(batch)
+        migrated += len(batch)
+    if delete_legacy and legacy_keys:
+        for i in range(0, len(legacy_keys), store.batch_size):
+            client.delete(*legacy_keys[i:i + store.batch_size])
+    return migrated
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="مدیریت مخزن نمونه‌های چهره در Redis")
+    parser.add_argument("command", choices=["migrate"])
+    parser.add_argument("--delete-legacy", action="store_true", help="حذف کلیدهای قدیمی پس از انتقال")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--db", type=int, default=0)
+    args = parser.parse_args()
+
+    store = FaceSampleStore(redis.StrictRedis(host=args.host, port=args.port, db=args.db))
+    if args.command == "migrate":
+        migrated = migrate_legacy(store, delete_legacy=args.delete_legacy)
+        logging.info(f"{migrated} رکورد چهره به قالب جدید منتقل شد.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import itertools
+
+import cv2
+
+from detection_profile import iou
+
+
+class Track:
+    """یک چهره ردیابی‌شده با شناسه پایدار و آخرین نتیجه شناسایی"""
+    def __init__(self, track_id, box, template):
+        self.id = track_id
+        self.box = box  # (x, y, w, h)
+        self.template = template
+        self.label = None
+        self.confidence = None
+        self.frames_since_recognition = 0
+
+    def needs_recognition(self, reid_confidence, reid_interval, refresh_interval):
+        """
+        سیاست شناسایی مجدد:
+         - ترک جدید همیشه شناسایی می‌شود.
+         - اگر اطمینان شناسایی ضعیف باشد (confidence بزرگ‌تر یا مساوی reid_confidence)، هر reid_interval فریم دوباره شناسایی می‌شود.
+         - اگر refresh_interval بزرگ‌تر از صفر باشد، ترک‌های مطمئن هم هر refresh_interval فریم بازبینی می‌شوند.
+        """
+        if self.label is None:
+            return True
+        if self.confidence >= reid_confidence:
+            return self.frames_since_recognition >= reid_interval
+        return refresh_interval > 0 and self.frames_since_recognition >= refresh_interval
+
+
+class FaceTracker:
+    """
+    ردیاب سبک چهره برای یک دوربین: تشخیص کامل Haar فقط هر detect_interval فریم یا پس از گم شدن یک ترک
+    اجرا می‌شود و در فریم‌های میانی، هر چهره با تطبیق الگو (matchTemplate) در اطراف موقعیت قبلی دنبال می‌شود.
+    """
+    def __init__(self, detect_interval=10, match_threshold=0.6, search_margin=0.5, iou_threshold=0.3,
+                 reid_confidence=70, reid_interval=5, refresh_interval=0):
+        self.detect_interval = detect_interval
+        self.match_threshold = match_threshold  # حداقل امتیاز تطبیق الگو برای ادامه ردیابی
+        self.search_margin = search_margin  # حاشیه ناحیه جستجو نسبت به اندازه چهره
+        self.iou_threshold = iou_threshold  # حداقل همپوشانی برای نسبت دادن تشخیص جدید به ترک موجود
+        self.reid_confidence = reid_confidence
+        self.reid_interval = reid_interval
+        self.refresh_interval = refresh_interval
+        self.tracks = []
+        self._ids = itertools.count(1)
+        self._frames_since_detection = detect_interval  # اولین فریم همیشه تشخیص کامل دارد
+        self._track_lost = False
+        self.detections = 0
+        self.frames = 0
+
+    def _follow(self, gray, track):
+        """دنبال کردن یک ترک با تطبیق الگو؛ False اگر ترک گم شده باشد"""
+        x, y, w, h = track.box
+        mx, my = int(w * self.search_margin), int(h * self.search_margin)
+        x1, y1 = max(0, x - mx), max(0, y - my)
+        x2, y2 = min(gray.shape[1], x + w + mx), min(gray.shape[0], y + h + my)
+        th, tw = track.template.shape[:2]
+        if x2 - x1 < tw or y2 - y1 < th:
+            return False
+        result = cv2.matchTemplate(gray[y1:y2, x1:x2], track.template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (bx, by) = cv2.minMaxLoc(result)
+        if score < self.match_threshold:
+            return False
+        track.box = (x1 + bx, y1 + by, tw, th)
+        return True
+
+    def _detect(self, gray, detect_fn):
+        """تشخیص کامل و تطبیق چهره‌های یافت‌شده با ترک‌های موجود بر اساس IoU"""
+        self.detections += 1
+        matched = []
+        unmatched = list(self.tracks)
+        for (x, y, w, h) in detect_fn(gray):
+            box = (int(x), int(y), int(w), int(h))
+            template = gray[box[1]:box[1] + box[3], box[0]:box[0] + box[2]].copy()
+            best = max(unmatched, key=lambda t: iou(t.box, box), default=None)
+            if best is not None and iou(best.box, box) >= self.iou_threshold:
+                unmatched.remove(best)
+                best.box, best.template = box, template
+                matched.append(best)
+            else:
+                matched.append(Track(next(self._ids), box, template))
+        self.tracks = matched
+
+    def update(self, gray, detect_fn):
+        """
+        به‌روزرسانی ترک‌ها برای فریم جدید (gray باید همان تصویر هیستوگرام‌شده‌ای باشد که برای تشخیص استفاده می‌شود).
+        detect_fn(gray) باید فهرست مستطیل‌های (x, y, w, h) را برگرداند.
+        """
+        self.frames += 1
+        for track in self.tracks:
+            track.frames_since_recognition += 1
+
+        if self._track_lost or self._frames_since_detection >= self.detect_interval:
+            self._detect(gray, detect_fn)
+            self._frames_since_detection = 0
+            self._track_lost = False
+        else:
+            alive = [t for t in self.tracks if self._follow(gray, t)]
+            self._track_lost = len(alive) < len(self.tracks)
+            self.tracks = alive
+            self._frames_since_detection += 1
+        return self.tracks
+
+    def tracks_to_recognize(self):
+        return [t for t in self.tracks
+                if t.needs_recognition(self.reid_confidence, self.reid_interval, self.refresh_interval)]
+
+    @staticmethod
+    def set_identity(track, label, confidence):
+        track.label = label
+        track.confidence = confidence
+        track.frames_since_recognition = 0
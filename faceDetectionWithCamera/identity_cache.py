@@ -0,0 +1,99 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+# کانال Redis که server.py پس از ثبت‌نام هر فرد، کد ملی او را روی آن منتشر می‌کند
+IDENTITY_CHANNEL = "identity:invalidate"
+
+
+class IdentityCache:
+    """
+    کش درون‌پروسه‌ای نام افراد (first_name, last_name) بر اساس کد ملی با انقضای زمانی (TTL) و حذف LRU.
+    هنگام اتصال به دیتابیس کل جدول NewPerson یک‌جا بارگذاری می‌شود و با ثبت‌نام افراد جدید
+    از طریق pub/sub در Redis، ورودی مربوطه باطل می‌شود؛ بنابراین در حالت پایدار هیچ کوئری نامی به MySQL ارسال نمی‌شود.
+    نبودِ یک کد ملی در NewPerson هم (با مقدار None) کش می‌شود.
+    متریک‌ها: hits و misses
+    """
+    def __init__(self, max_size=50000, ttl=6 * 3600):
+        self.max_size = max_size
+        self.ttl = ttl  # ثانیه
+        self._entries = OrderedDict()  # national_code -> (expires_at, name)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._pubsub = None
+        self._listener = None
+        self._stopped = threading.Event()
+
+    def lookup(self, national_code):
+        """
+        برگرداندن (True, name) در صورت وجود در کش (name برای افراد ناشناخته None است)
+        و (False, None) در صورت نبودن یا منقضی شدن
+        """
+        with self._lock:
+            entry = self._entries.get(national_code)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(national_code)
+                self.hits += 1
+                return True, entry[1]
+            if entry is not None:
+                del self._entries[national_code]
+            self.misses += 1
+            return False, None
+
+    def put(self, national_code, name):
+        with self._lock:
+            self._entries[national_code] = (time.monotonic() + self.ttl, name)
+            self._entries.move_to_end(national_code)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, national_code):
+        with self._lock:
+            self._entries.pop(national_code, None)
+
+    def warm(self, db):
+        """بارگذاری یک‌جای همه افراد از جدول NewPerson"""
+        cursor = db.cursor()
+        try:
+            cursor.execute("SELECT national_code, first_name, last_name FROM NewPerson")
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        for national_code, first_name, last_name in rows[:self.max_size]:
+            self.put(str(national_code), (first_name, last_name))
+        logger.info(f"کش هویت با {len(rows)} نفر بارگذاری شد.")
+
+    # --------------------- باطل‌سازی از طریق Redis ---------------------
+    def _listen(self, redis_config):
+        while not self._stopped.is_set():
+            try:
+                client = redis.StrictRedis(decode_responses=True, **redis_config)
+                self._pubsub = client.pubsub(ignore_subscribe_messages=True)
+                self._pubsub.subscribe(IDENTITY_CHANNEL)
+                for message in self._pubsub.listen():
+                    self.invalidate(str(message['data']))
+            except Exception as e:
+                # بسته شدن pubsub هنگام توقف برنامه هم به اینجا می‌رسد
+                if self._stopped.is_set():
+                    return
+                logger.error(f"خطا در اتصال pub/sub کش هویت: {e}")
+                self._stopped.wait(5)
+
+    def start_listener(self, redis_config):
+        """شروع گوش دادن به پیام‌های باطل‌سازی در یک رشته پس‌زمینه"""
+        self._stopped.clear()
+        self._listener = threading.Thread(
+            target=self._listen, args=(redis_config,), name="identity-cache-listener", daemon=True
+        )
+        self._listener.start()
+
+    def stop_listener(self):
+        self._stopped.set()
+        if self._pubsub is not None:
+            self._pubsub.close()
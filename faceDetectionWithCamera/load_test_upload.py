@@ -0,0 +1,111 @@
+"""
+آزمون بار روت /upload سرور ثبت‌نام: ارسال همزمان درخواست‌های ثبت‌نام با چند سطح همزمانی
+و گزارش توان عملیاتی (درخواست در ثانیه)، صدک‌های تأخیر و تعداد هر کد وضعیت.
+
+تصاویر از یک پوشه عکس چهره خوانده می‌شوند و به صورت چرخشی ارسال می‌شوند. هر درخواست کد ملی یکتایی
+از بازه --code-start دارد، پس افراد آزمایشی در Redis، MySQL و مدل ثبت می‌شوند؛
+آزمون را فقط روی محیط آزمایشی اجرا کنید.
+
+اجرا:
+    python server.py --production --threads 16
+    python load_test_upload.py samples/ --url http://127.0.0.1:5000/upload --concurrency 1 4 16 --requests 200
+"""
+import argparse
+import base64
+import collections
+import itertools
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def load_images(directory):
+    """خواندن تصاویر و تبدیل آن‌ها به data URI (قالب مورد انتظار base64_to_cv2_image)"""
+    images = []
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith(IMAGE_EXTENSIONS):
+            with open(os.path.join(directory, name), 'rb') as f:
+                mime = "image/png" if name.lower().endswith(".png") else "image/jpeg"
+                images.append(f"data:{mime};base64," + base64.b64encode(f.read()).decode('ascii'))
+    return images
+
+
+def post_upload(url, payload, timeout):
+    """ارسال یک درخواست؛ خروجی (کد وضعیت، تأخیر)"""
+    body = json.dumps(payload).encode('utf-8')
+    req = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        status = 0  # خطای اتصال یا پایان زمان
+    return status, time.perf_counter() - start
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run(args, images, concurrency, codes):
+    lock = threading.Lock()
+    image_cycle = itertools.cycle(images)
+
+    def one_request(_):
+        with lock:
+            image, national_code = next(image_cycle), next(codes)
+        return post_upload(args.url, {
+            "image": image,
+            "nationalCode": str(national_code),
+            "firstName": "load",
+            "lastName": f"test{national_code}",
+        }, args.timeout)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one_request, range(args.requests)))
+    wall = time.perf_counter() - start
+
+    latencies = sorted(latency for _, latency in results)
+    statuses = collections.Counter(status for status, _ in results)
+    return wall, latencies, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description="آزمون بار ثبت‌نام همزمان روی /upload")
+    parser.add_argument("images", help="پوشه تصاویر چهره")
+    parser.add_argument("--url", default="http://127.0.0.1:5000/upload")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=100, help="تعداد درخواست در هر سطح همزمانی")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--code-start", type=int, default=2000000000, help="شروع بازه کدهای ملی آزمایشی")
+    args = parser.parse_args()
+
+    images = load_images(args.images)
+    if not images:
+        parser.error("هیچ تصویری در پوشه یافت نشد.")
+    # کدهای ملی یکتا در همه سطوح همزمانی و اجراهای پیاپی؛ کمتر از 2^31 چون لیبل LBPH عدد صحیح 32 بیتی است
+    codes = itertools.count(args.code_start + int(time.time()) % 10 ** 5 * 1000)
+
+    print(f"{'concurrency':>11} | {'req/s':>7} | {'p50 ms':>7} | {'p90 ms':>7} | {'p99 ms':>8} | statuses")
+    for concurrency in args.concurrency:
+        wall, latencies, statuses = run(args, images, concurrency, codes)
+        status_text = ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items()))
+        print(f"{concurrency:>11} | {len(latencies) / wall:>7.1f} | {percentile(latencies, 50) * 1000:>7.0f} | "
+              f"{percentile(latencies, 90) * 1000:>7.0f} | {percentile(latencies, 99) * 1000:>8.0f} | {status_text}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+لایه سبک اندازه‌گیری: هیستوگرام تأخیر مراحل، شمارنده‌ها و گیج‌ها با خروجی متنی Prometheus،
+به همراه یک پروفایلر نمونه‌برداری اختیاری برای تشخیص گلوگاه (رمزگشایی، تشخیص، دیتابیس و ...).
+"""
+import collections
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# مرزهای پیش‌فرض هیستوگرام تأخیر (ثانیه)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+class MetricsRegistry:
+    """
+    نگه‌داری متریک‌ها با برچسب. هر متریک با نام و برچسب‌های kwargs شناسایی می‌شود.
+    گیج‌ها و شمارنده‌های محاسباتی با register_gauge و register_counter ثبت می‌شوند و فقط هنگام خواندن
+    /metrics محاسبه می‌شوند؛ register_counter برای مقادیر یکنواخت افزایشی (مثلاً تعداد ثبت‌ها) است.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}  # name -> {labels: _Histogram}
+        self._counters = collections.defaultdict(lambda: collections.defaultdict(float))
+        self._gauges = collections.defaultdict(dict)
+        self._gauge_fns = {}  # name -> fn() -> {labels_dict_as_tuple: value}
+        self._counter_fns = {}  # name -> fn() -> {labels_dict_as_tuple: value}
+        self._help = {}
+
+    def describe(self, name, text):
+        self._help[name] = text
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        with self._lock:
+            self._counters[name][tuple(sorted(labels.items()))] += amount
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._gauges[name][tuple(sorted(labels.items()))] = value
+
+    def register_gauge(self, name, fn):
+        """fn باید فهرست (labels_dict, value) برگرداند"""
+        self._gauge_fns[name] = fn
+
+    def register_counter(self, name, fn):
+        """fn باید فهرست (labels_dict, value) با مقادیر غیرکاهشی برگرداند"""
+        self._counter_fns[name] = fn
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def render(self):
+        """خروجی متنی قالب Prometheus"""
+        lines = []
+
+        def header(name, kind):
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                header(name, "histogram")
+                for key, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(key + (('le', bound),))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(key + (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            gauges = {name: dict(series) for name, series in self._gauges.items()}
+
+        for values, fns in ((counters, self._counter_fns), (gauges, self._gauge_fns)):
+            for name, fn in fns.items():
+                try:
+                    for labels, value in fn():
+                        values.setdefault(name, {})[tuple(sorted(labels.items()))] = value
+                except Exception as e:
+                    logger.error(f"خطا در محاسبه متریک {name}: {e}")
+        for kind, values in (("counter", counters), ("gauge", gauges)):
+            for name, series in sorted(values.items()):
+                header(name, kind)
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class SamplingProfiler:
+    """
+    پروفایلر نمونه‌برداری: هر interval ثانیه پشته همه رشته‌ها را می‌خواند و تعداد دفعات دیده‌شدن
+    هر تابع (بالای پشته) را به تفکیک نام رشته می‌شمارد. سربار آن فقط هنگام فعال بودن وجود دارد.
+    """
+    def __init__(self, interval=0.01, depth=3):
+        self.interval = interval
+        self.depth = depth  # تعداد قاب‌های بالای پشته که در کلید نمونه نگه داشته می‌شوند
+        self._samples = collections.Counter()
+        self._total = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.depth:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self._samples[(names.get(thread_id, str(thread_id)), " <- ".join(stack))] += 1
+            self._total += 1
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._samples.clear()
+        self._total = 0
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        logger.info("پروفایلر نمونه‌برداری فعال شد.")
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+        logger.info("پروفایلر نمونه‌برداری متوقف شد.")
+
+    def report(self, top=40):
+        lines = [f"samples: {self._total}"]
+        for (thread_name, stack), count in self._samples.most_common(top):
+            share = count / self._total if self._total else 0.0
+            lines.append(f"{share:6.1%}  [{thread_name}] {stack}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """
+    سرور HTTP محلی متریک‌ها:
+      /metrics         خروجی Prometheus
+      /profile/start   فعال‌سازی پروفایلر نمونه‌برداری
+      /profile/stop    توقف پروفایلر و برگرداندن گزارش
+      /profile         گزارش فعلی پروفایلر
+    """
+    def __init__(self, registry, host="127.0.0.1", port=9100, profiler=None):
+        self.registry = registry
+        self.profiler = profiler or SamplingProfiler()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+            def do_GET(self):
+                if self.path == "/metrics":
+                    server.reply(self, server.registry.render(), "text/plain; version=0.0.4")
+                elif self.path == "/profile/start":
+                    server.profiler.start()
+                    server.reply(self, "profiler started\n")
+                elif self.path == "/profile/stop":
+                    server.profiler.stop()
+                    server.reply(self, server.profiler.report())
+                elif self.path == "/profile":
+                    server.reply(self, server.profiler.report())
+                else:
+                    self.send_error(404)
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @staticmethod
+    def reply(handler, text, content_type="text/plain; charset=utf-8"):
+        body = text.encode("utf-8")
+        handler.send_response(200)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="metrics-server", daemon=True)
+        self._thread.start()
+        host, port = self._httpd.server_address[:2]
+        logger.info(f"متریک‌ها روی http://{host}:{port}/metrics در دسترس است.")
+
+    def stop(self):
+        self.profiler.stop()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+# رجیستری پیش‌فرض هر پروسه
+registry = MetricsRegistry()
@@ -0,0 +1,144 @@
+import html
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+BOUNDARY = "frame"
+
+
+class MjpegPublisher:
+    """
+    انتشار یک منبع فریم به صورت JPEG با نرخ محدود.
+    رمزگذاری JPEG فقط وقتی انجام می‌شود که حداقل یک بیننده متصل باشد و بین همه بینندگان مشترک است.
+    frame_source(seq) باید (فریم، شماره) را فقط برای فریم جدیدتر از seq برگرداند و در غیر این صورت (None, seq).
+    """
+    def __init__(self, frame_source, fps=5, quality=70):
+        self.frame_source = frame_source
+        self.interval = 1.0 / fps
+        self.quality = quality
+        self._cond = threading.Condition()
+        self._viewers = 0
+        self._jpeg = None
+        self._jpeg_seq = 0
+        self._thread = None
+
+    @property
+    def viewers(self):
+        return self._viewers
+
+    def subscribe(self):
+        with self._cond:
+            self._viewers += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._encode_loop, name="mjpeg-encoder", daemon=True)
+                self._thread.start()
+
+    def unsubscribe(self):
+        with self._cond:
+            self._viewers -= 1
+
+    def _encode_loop(self):
+        frame_seq = 0
+        while True:
+            with self._cond:
+                if self._viewers <= 0:
+                    self._thread = None
+                    self._jpeg = None
+                    return
+            start = time.monotonic()
+            frame, frame_seq = self.frame_source(frame_seq)
+            if frame is not None:
+                ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+                if ok:
+                    with self._cond:
+                        self._jpeg = buffer.tobytes()
+                        self._jpeg_seq += 1
+                        self._cond.notify_all()
+            time.sleep(max(0.0, self.interval - (time.monotonic() - start)))
+
+    def wait_jpeg(self, last_seq, timeout=5.0):
+        """انتظار برای JPEG جدیدتر از last_seq؛ خروجی (شماره، بایت‌ها) یا (last_seq, None) پس از پایان زمان"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._jpeg_seq > last_seq and self._jpeg is not None, timeout)
+            if self._jpeg_seq > last_seq and self._jpeg is not None:
+                return self._jpeg_seq, self._jpeg
+            return last_seq, None
+
+
+class MjpegServer:
+    """
+    سرور HTTP برای مشاهده خروجی دوربین‌ها در حالت بدون رابط گرافیکی:
+      /              فهرست جریان‌ها
+      /stream/grid   گرید همه دوربین‌ها
+      /stream/<n>    دوربین شماره n
+    """
+    def __init__(self, publishers, host="0.0.0.0", port=8080):
+        self.publishers = publishers  # نام جریان -> MjpegPublisher
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+            def do_GET(self):
+                if self.path == "/":
+                    server.send_index(self)
+                elif self.path.startswith("/stream/") and self.path[len("/stream/"):] in server.publishers:
+                    server.send_stream(self, server.publishers[self.path[len("/stream/"):]])
+                else:
+                    self.send_error(404)
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    def has_viewers(self):
+        return any(publisher.viewers > 0 for publisher in self.publishers.values())
+
+    def send_index(self, handler):
+        links = "".join(
+            f'<li><a href="/stream/{html.escape(name)}">{html.escape(name)}</a></li>' for name in self.publishers
+        )
+        body = f"<html><body><ul>{links}</ul></body></html>".encode("utf-8")
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/html; charset=utf-8")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def send_stream(self, handler, publisher):
+        handler.send_response(200)
+        handler.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+        handler.send_header("Cache-Control", "no-cache")
+        handler.end_headers()
+        publisher.subscribe()
+        seq = 0
+        try:
+            while True:
+                seq, jpeg = publisher.wait_jpeg(seq)
+                if jpeg is None:
+                    continue
+                handler.wfile.write(
+                    f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n\r\n".encode()
+                )
+                handler.wfile.write(jpeg)
+                handler.wfile.write(b"\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            publisher.unsubscribe()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mjpeg-server", daemon=True)
+        self._thread.start()
+        host, port = self._httpd.server_address[:2]
+        logger.info(f"جریان MJPEG روی http://{host}:{port}/ در دسترس است.")
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
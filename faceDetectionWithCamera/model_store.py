@@ -0,0 +1,162 @@
+import json
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+# --------------------- تنظیمات مدل ---------------------
+MODEL_PATH = "trainer/model.xml"
+LABELS_PATH = "labels_to_name.json"
+FACE_SIZE = (100, 100)  # اندازه چهره‌ها هنگام آموزش مدل
+# نسخه نرمال‌سازی چهره‌ها (face_preprocess)؛ با هر تغییر در پیش‌پردازش افزایش می‌یابد.
+# 1: چهره 200x200 بدون یکسان‌سازی هیستوگرام، 2: FacePreprocessor (100x100 با یکسان‌سازی هر چهره)
+PREPROCESS_VERSION = 2
+# فاصله تجمیع ذخیره‌سازی مدل پس از به‌روزرسانی افزایشی (ثانیه)؛ ثبت‌نام‌های این بازه با یک نوشتن ذخیره می‌شوند
+SAVE_DELAY = 2.0
+
+
+class FaceModelStore:
+    """
+    نگه‌داری مدل LBPH و نگاشت لیبل‌ها در حافظه.
+    ثبت‌نام هر فرد جدید با update() فقط هیستوگرام همان فرد را به مدل اضافه می‌کند
+    و نیازی به خواندن دوباره همه چهره‌ها از Redis نیست؛ rebuild() آموزش کامل از صفر است.
+    نوشتن model.xml با تعداد افراد رشد خطی دارد، پس پس از update() فقط یک ذخیره با تأخیر save_delay
+    در رشته پس‌زمینه زمان‌بندی می‌شود و همه ثبت‌نام‌های این بازه با یک نوشتن ذخیره می‌شوند؛
+    flush() تغییرات معوق را فوراً می‌نویسد. زمان آخرین update و آخرین ذخیره در
+    last_update_seconds و last_save_seconds نگه داشته می‌شود.
+    نسخه پیش‌پردازش مدل در فایل <model>.meta.json کنار مدل ذخیره می‌شود؛ مدلی که با نسخه دیگری
+    آموزش دیده (needs_rebuild) باید با rebuild() از روی نمونه‌ها بازسازی شود.
+    """
+    def __init__(self, model_path=MODEL_PATH, labels_path=LABELS_PATH, save_delay=SAVE_DELAY):
+        self.model_path = model_path
+        self.labels_path = labels_path
+        self.meta_path = os.path.splitext(model_path)[0] + ".meta.json"
+        self._lock = threading.Lock()
+        self.model = None
+        self.labels_to_name = {}
+        self.preprocess_version = PREPROCESS_VERSION
+        self.save_delay = save_delay
+        self._save_timer = None
+        self.last_update_seconds = 0.0
+        self.last_save_seconds = 0.0
+        self._load()
+
+    @property
+    def needs_rebuild(self):
+        """آیا مدل موجود با نسخه دیگری از پیش‌پردازش چهره آموزش دیده است"""
+        return self.model is not None and self.preprocess_version != PREPROCESS_VERSION
+
+    @property
+    def identity_count(self):
+        """تعداد افراد متمایز موجود در مدل (مستقل از فایل لیبل‌ها)"""
+        with self._lock:
+            if self.model is None:
+                return 0
+            return len(np.unique(self.model.getLabels()))
+
+    def _load(self):
+        """بارگذاری مدل و لیبل‌های ذخیره‌شده (در صورت وجود)"""
+        if os.path.exists(self.model_path):
+            model = cv2.face.LBPHFaceRecognizer_create()
+            model.read(self.model_path)
+            self.model = model
+            # مدل‌های ساخته‌شده پیش از ثبت نسخه، فایل meta ندارند و با نسخه 1 آموزش دیده‌اند
+            self.preprocess_version = 1
+            if os.path.exists(self.meta_path):
+                with open(self.meta_path, encoding='utf-8') as json_file:
+                    self.preprocess_version = json.load(json_file).get("preprocess_version", 1)
+        if os.path.exists(self.labels_path):
+            with open(self.labels_path, encoding='utf-8') as json_file:
+                self.labels_to_name = {int(k): v for k, v in json.load(json_file).items()}
+
+    def add_identity(self, label, full_name, face_image):
+        """
+        اضافه کردن افزایشی یک فرد به مدل و زمان‌بندی ذخیره آن.
+        اگر هنوز مدلی وجود نداشته باشد، مدل با همین یک نمونه آموزش داده می‌شود.
+        """
+        self.add_identities([(label, full_name, face_image)])
+
+    def add_identities(self, identities):
+        """اضافه کردن افزایشی چند فرد (label, full_name, face_image) با یک update() و یک ذخیره معوق"""
+        if not identities:
+            return
+        faces = [
+            face_image if face_image.shape[:2] == (FACE_SIZE[1], FACE_SIZE[0]) else cv2.resize(face_image, FACE_SIZE)
+            for _, _, face_image in identities
+        ]
+        labels = np.array([label for label, _, _ in identities])
+        with self._lock:
+            start = time.perf_counter()
+            if self.model is None:
+                self.model = cv2.face.LBPHFaceRecognizer_create()
+                self.model.train(faces, labels)
+            else:
+                self.model.update(faces, labels)
+            for label, full_name, _ in identities:
+                self.labels_to_name[label] = {
+                    "full_name": full_name,
+                    "student_id": str(label)
+                }
+            self.last_update_seconds = time.perf_counter() - start
+            self._schedule_save()
+
+    def _schedule_save(self):
+        """زمان‌بندی یک ذخیره معوق (در صورت نبود ذخیره زمان‌بندی‌شده)؛ باید با قفل فراخوانی شود"""
+        if self._save_timer is None:
+            # رشته غیر daemon است تا ذخیره معوق هنگام خروج عادی پروسه کامل شود
+            self._save_timer = threading.Timer(self.save_delay, self.flush)
+            self._save_timer.name = "model-save"
+            self._save_timer.start()
+
+    def flush(self):
+        """نوشتن فوری تغییرات معوق مدل (در صورت وجود)"""
+        with self._lock:
+            if self._save_timer is None:
+                return
+            self._save_timer.cancel()
+            self._save_timer = None
+            self._save()
+
+    def rebuild(self, faces, labels, labels_to_name):
+        """
+        آموزش کامل مدل از صفر با همه چهره‌ها (عملیات مدیریتی).
+        آموزش خارج از قفل و روی تصویری از داده‌ها انجام می‌شود؛ add_identities همزمان پس از آن تصویر
+        با جایگزینی مدل از دست می‌رود، پس همه تغییرات مدل باید از یک صف تک‌رشته‌ای اجرا شوند.
+        """
+        model = cv2.face.LBPHFaceRecognizer_create()
+        model.train(faces, np.array(labels))
+        with self._lock:
+            self.model = model
+            self.labels_to_name = dict(labels_to_name)
+            self.preprocess_version = PREPROCESS_VERSION
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            self._save()
+
+    def _save(self):
+        """
+        ذخیره مدل و لیبل‌ها در فایل موقت و جایگزینی اتمیک آن،
+        تا پروسه دوربین‌ها هرگز فایل نیمه‌نوشته را نخواند. باید با قفل فراخوانی شود.
+        """
+        start = time.perf_counter()
+        os.makedirs(os.path.dirname(self.model_path) or ".", exist_ok=True)
+        # پسوند فایل موقت باید xml بماند تا OpenCV قالب را درست تشخیص دهد
+        root, ext = os.path.splitext(self.model_path)
+        tmp_model_path = f"{root}.tmp{ext}"
+        self.model.write(tmp_model_path)
+        os.replace(tmp_model_path, self.model_path)
+
+        tmp_labels_path = self.labels_path + ".tmp"
+        with open(tmp_labels_path, 'w', encoding='utf-8') as json_file:
+            json.dump(self.labels_to_name, json_file, ensure_ascii=False, indent=4)
+        os.replace(tmp_labels_path, self.labels_path)
+
+        # به‌روزرسانی افزایشی نسخه مدل قدیمی را تغییر نمی‌دهد؛ فقط rebuild نسخه را جاری می‌کند
+        tmp_meta_path = self.meta_path + ".tmp"
+        with open(tmp_meta_path, 'w', encoding='utf-8') as json_file:
+            json.dump({"preprocess_version": self.preprocess_version}, json_file)
+        os.replace(tmp_meta_path, self.meta_path)
+        self.last_save_seconds = time.perf_counter() - start
@@ -0,0 +1,98 @@
+import collections
+import threading
+import time
+
+
+class Presence:
+    """وضعیت حضور یک فرد"""
+    def __init__(self):
+        self.location = None  # مکان تأییدشده؛ None یعنی هنوز تأیید نشده
+        self.last_seen = 0.0
+        self.last_upsert = None  # زمان آخرین مشاهده‌ای که در latest_attendance نوشته شده است
+        self.hits = collections.deque()  # شناسایی‌های اخیر (زمان، مکان) داخل پنجره
+
+
+class PresenceEngine:
+    """
+    موتور وضعیت حضور: تبدیل شناسایی‌های فریم به فریم به رویدادهای حضور.
+     - یک فرد فقط وقتی در یک مکان حاضر شناخته می‌شود که حداقل min_hits شناسایی در همان مکان
+       داخل پنجره لغزان window ثانیه داشته باشد (حذف شناسایی‌های اشتباه تک‌فریمی).
+     - ثبت در جدول attendance فقط هنگام تأیید اولیه یا تغییر مکان انجام می‌شود.
+     - به‌روزرسانی latest_attendance برای هر فرد حداکثر هر latest_interval ثانیه یک بار انجام می‌شود.
+     - فردی که absence_timeout ثانیه دیده نشود حذف می‌شود و حضور بعدی او یک ورود جدید است؛
+       این جایگزین پاک کردن یک‌جای همه وضعیت‌ها است، پس پس از آن هجوم ثبت رخ نمی‌دهد.
+    رویدادها دیکشنری‌هایی با کلیدهای national_code، location، seen_at (timestamp) و insert_attendance هستند.
+    """
+    def __init__(self, window=5.0, min_hits=3, latest_interval=60.0, absence_timeout=7200.0, clock=time.time):
+        self.window = window
+        self.min_hits = min_hits
+        self.latest_interval = latest_interval
+        self.absence_timeout = absence_timeout
+        self.clock = clock
+        self._people = {}
+        self._lock = threading.Lock()
+        self.observations = 0
+        self.events = 0
+
+    def __len__(self):
+        return len(self._people)
+
+    @staticmethod
+    def _event(national_code, presence, insert_attendance):
+        presence.last_upsert = presence.last_seen
+        return {
+            'national_code': national_code,
+            'location': presence.location,
+            'seen_at': presence.last_seen,
+            'insert_attendance': insert_attendance
+        }
+
+    def observe(self, national_code, location, now=None):
+        """ثبت یک شناسایی؛ خروجی رویداد حضور یا None اگر رویدادی لازم نباشد"""
+        now = self.clock() if now is None else now
+        with self._lock:
+            self.observations += 1
+            presence = self._people.get(national_code)
+            if presence is None:
+                presence = self._people[national_code] = Presence()
+
+            hits = presence.hits
+            hits.append((now, location))
+            while hits and hits[0][0] < now - self.window:
+                hits.popleft()
+
+            if location != presence.location:
+                # مکان جدید (یا فرد هنوز تأییدنشده): منتظر شناسایی‌های پیاپی کافی در همین مکان
+                if sum(1 for _, hit_location in hits if hit_location == location) < self.min_hits:
+                    return None
+                presence.location = location
+                presence.last_seen = now
+                self.events += 1
+                return self._event(national_code, presence, insert_attendance=True)
+
+            presence.last_seen = now
+            if now - presence.last_upsert < self.latest_interval:
+                return None
+            self.events += 1
+            return self._event(national_code, presence, insert_attendance=False)
+
+    def evict(self, now=None, everything=False):
+        """
+        حذف افرادی که absence_timeout ثانیه دیده نشده‌اند (یا همه افراد با everything=True).
+        خروجی رویدادهای latest_attendance معوق افراد حذف‌شده، تا آخرین زمان مشاهده از دست نرود.
+        """
+        now = self.clock() if now is None else now
+        pending = []
+        with self._lock:
+            for national_code, presence in list(self._people.items()):
+                if presence.location is None:
+                    # فرد تأییدنشده: با خالی شدن پنجره شناسایی‌ها حذف می‌شود
+                    if everything or not presence.hits or presence.hits[-1][0] < now - self.window:
+                        del self._people[national_code]
+                    continue
+                if everything or now - presence.last_seen >= self.absence_timeout:
+                    if presence.last_seen > presence.last_upsert:
+                        self.events += 1
+                        pending.append(self._event(national_code, presence, insert_attendance=False))
+                    del self._people[national_code]
+        return pending
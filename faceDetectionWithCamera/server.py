@@ -1,35 +1,105 @@
+import argparse
 import base64
+import collections
 import numpy as np
 import redis
 import cv2
-from flask import Flask, request, jsonify
+import time
+from flask import Flask, request, jsonify, g, Response
 from flask_cors import CORS
-from persiantools.jdatetime import JalaliDateTime
 import json
 import os
 import logging
+import threading
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import mysql.connector
+import mysql.connector.pooling
+from model_store import FaceModelStore
+from identity_cache import IDENTITY_CHANNEL
+from face_store import FaceSampleStore, UnmigratedSamplesError
+from detection_profile import DetectionProfile
+from face_preprocess import FacePreprocessor
+from metrics import registry as metrics
 
 os.makedirs("trainer", exist_ok=True)
 # تنظیمات لاگ
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # --------------------- تنظیمات اتصال ---------------------
-# تنظیمات Redis
-redis_client = redis.StrictRedis(host='localhost', port=6379, db=0, decode_responses=True)
-
-# تنظیمات MySQL
-mysql_connection = mysql.connector.connect(
-    host='localhost',
-    database='face_recognition',
-    user='root',
-    password='1234'
+REDIS_CONFIG = {
+    'host': 'localhost',
+    'port': 6379,
+    'db': 0
+}
+REDIS_POOL_SIZE = 32  # حداکثر اتصال همزمان به Redis برای هر نوع کلاینت
+
+MYSQL_CONFIG = {
+    'host': 'localhost',
+    'database': 'face_recognition',
+    'user': 'root',
+    'password': '1234'
+}
+MYSQL_POOL_SIZE = 8  # حداکثر اتصال همزمان به MySQL (سقف mysql.connector برابر 32 است)
+MYSQL_POOL_TIMEOUT = 5.0  # حداکثر انتظار برای آزاد شدن یک اتصال (ثانیه)
+
+# تنظیمات Redis؛ هر کلاینت از یک استخر اتصال محدود استفاده می‌کند که بین رشته‌های درخواست مشترک است
+redis_client = redis.StrictRedis(connection_pool=redis.BlockingConnectionPool(
+    max_connections=REDIS_POOL_SIZE, timeout=5, decode_responses=True, **REDIS_CONFIG
+))
+# نمونه‌های چهره به صورت بایت خام ذخیره می‌شوند و نباید به رشته تبدیل شوند
+face_store = FaceSampleStore(redis.StrictRedis(connection_pool=redis.BlockingConnectionPool(
+    max_connections=REDIS_POOL_SIZE, timeout=5, **REDIS_CONFIG
+)))
+
+# تنظیمات MySQL؛ هر درخواست یک اتصال از استخر می‌گیرد و پس از پایان آن را برمی‌گرداند
+mysql_pool = mysql.connector.pooling.MySQLConnectionPool(
+    pool_name="face_server", pool_size=MYSQL_POOL_SIZE, **MYSQL_CONFIG
 )
 
+@contextmanager
+def mysql_connection():
+    """
+    گرفتن یک اتصال از استخر MySQL (با انتظار محدود در صورت مشغول بودن همه اتصال‌ها).
+    اتصال‌هایی که توسط MySQL بسته شده‌اند پیش از استفاده دوباره برقرار می‌شوند.
+    """
+    deadline = time.monotonic() + MYSQL_POOL_TIMEOUT
+    while True:
+        try:
+            connection = mysql_pool.get_connection()
+            break
+        except mysql.connector.errors.PoolError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.01)
+    try:
+        connection.ping(reconnect=True, attempts=2, delay=0)
+        yield connection
+    finally:
+        # close() اتصال را به استخر برمی‌گرداند
+        connection.close()
+
 # تنظیمات Flask و CORS
 app = Flask(__name__)
 CORS(app)
 
+STAGE_METRIC = "server_stage_seconds"
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def observe_request(response):
+    """ثبت تأخیر هر درخواست به تفکیک روت و کد وضعیت"""
+    start = g.get("request_start")
+    if start is not None and request.endpoint != "metrics_endpoint":
+        metrics.observe("server_request_seconds", time.perf_counter() - start,
+                        endpoint=request.endpoint or "unknown", status=response.status_code)
+    return response
+
 # --------------------- تنظیمات Haar Cascade ---------------------
 HAAR_CASCADE_PATHS = {
     "face": "assets/face_detection/haarcascade_frontalface_default.xml",
@@ -42,6 +112,41 @@ if not all(os.path.exists(path) for path in HAAR_CASCADE_PATHS.values()):
 face_cascade = cv2.CascadeClassifier(HAAR_CASCADE_PATHS["face"])
 eye_cascade = cv2.CascadeClassifier(HAAR_CASCADE_PATHS["eye"])
 
+# پروفایل تشخیص تصاویر ثبت‌نام: عکس‌های بزرگ پیش از تشخیص تا ضلع 800 پیکسل کوچک می‌شوند
+# و برش چهره از تصویر با وضوح کامل انجام می‌شود
+DETECTION_PROFILE = DetectionProfile(max_dimension=800, min_size=(60, 60))
+
+# نرمال‌سازی مشترک چهره‌ها با CameraManager (برش، هم‌ترازی اختیاری، 100x100 و یکسان‌سازی هیستوگرام)
+face_preprocessor = FacePreprocessor(eye_cascade_path=HAAR_CASCADE_PATHS["eye"])
+
+# CascadeClassifier بین رشته‌ها ایمن نیست؛ رشته‌های اعتبارسنجی دسته‌ای نسخه مخصوص خود را می‌سازند
+_thread_cascades = threading.local()
+
+def get_thread_cascades():
+    """برگرداندن cascadeهای چهره و چشم مخصوص رشته جاری"""
+    if not hasattr(_thread_cascades, "face"):
+        _thread_cascades.face = cv2.CascadeClassifier(HAAR_CASCADE_PATHS["face"])
+        _thread_cascades.eye = cv2.CascadeClassifier(HAAR_CASCADE_PATHS["eye"])
+    return _thread_cascades.face, _thread_cascades.eye
+
+# --------------------- مدل تشخیص چهره ---------------------
+model_store = FaceModelStore()
+
+# --------------------- کارهای پس‌زمینه ---------------------
+# پردازش تصاویر (رمزگشایی، تشخیص و اعتبارسنجی چهره، رمزگذاری JPEG) خارج از رشته درخواست؛
+# توابع OpenCV قفل GIL را آزاد می‌کنند، پس این رشته‌ها همه هسته‌ها را به کار می‌گیرند
+# و تعداد کارهای سنگین همزمان مستقل از تعداد رشته‌های سرور به تعداد هسته‌ها محدود می‌ماند
+validation_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 4)
+# همه تغییرات مدل (update افزایشی /upload، کارهای دسته‌ای، /admin/retrain و بازسازی خودکار) فقط از این
+# صف تک‌رشته‌ای اجرا می‌شوند تا بازسازی کامل، ثبت‌نامی را که پس از خواندن Redis رسیده از دست ندهد
+training_executor = ThreadPoolExecutor(max_workers=1)
+training_jobs = {}
+training_jobs_lock = threading.Lock()
+JOB_TTL = 3600  # مدت نگه‌داری وضعیت کارهای پایان‌یافته (ثانیه)
+MAX_FINISHED_JOBS = 1000  # حداکثر تعداد کارهای پایان‌یافته نگه‌داری‌شده
+# حداکثر تصاویر ثبت‌نام دسته‌ای که همزمان خوانده و در صف اعتبارسنجی هستند
+MAX_PENDING_VALIDATIONS = 2 * (os.cpu_count() or 4)
+
 # --------------------- توابع کمکی ---------------------
 def base64_to_cv2_image(base64_str):
     """تبدیل رشته Base64 به تصویر OpenCV"""
@@ -54,118 +159,220 @@ def base64_to_cv2_image(base64_str):
         logging.error(f"خطا در تبدیل تصویر Base64: {e}")
         raise ValueError("تصویر معتبر نیست.")
 
-def detect_and_validate_face(image):
-    """تشخیص چهره و اعتبارسنجی آن (وجود حداقل ۲ چشم)"""
+def detect_and_validate_face(image, cascades=None):
+    """
+    تشخیص چهره و اعتبارسنجی آن (وجود حداقل ۲ چشم)
+    cascades: زوج (face_cascade, eye_cascade) برای استفاده در رشته‌های دیگر؛ پیش‌فرض cascadeهای سراسری
+    خروجی (face, crop, box): face چهره نرمال‌شده با face_preprocessor برای Redis و مدل (همان شکلی که
+    دوربین‌ها استفاده می‌کنند) و crop برش خاکستری 200x200 برای ستون image جدول NewPerson است.
+    """
+    face_detector, eye_detector = cascades or (face_cascade, eye_cascade)
     try:
         gray_img = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        faces = face_cascade.detectMultiScale(gray_img, scaleFactor=1.3, minNeighbors=5)
+        faces = DETECTION_PROFILE.detect(face_detector, gray_img)
 
         if len(faces) == 0:
-            return None, None
+            return None, None, None
 
         for (x, y, w, h) in faces:
             face = gray_img[y:y + h, x:x + w]
             face = cv2.resize(face, (200, 200))
 
             # بررسی وجود چشم‌ها در ناحیه چهره
-            eyes_detected = eye_cascade.detectMultiScale(face)
+            eyes_detected = eye_detector.detectMultiScale(face)
             if len(eyes_detected) < 2:
                 logging.warning("چهره ناقص است: چشم‌ها شناسایی نشدند.")
-                return None, None
+                return None, None, None
 
-            return face, (x, y, w, h)
+            return face_preprocessor.normalize([face], [eyes_detected])[0], face, (x, y, w, h)
 
-        return None, None
+        return None, None, None
     except Exception as e:
         logging.error(f"خطا در پردازش تصویر: {e}")
         raise
 
-def train_model():
-    """
-    آموزش مدل با داده‌های موجود در Redis
-    """
-    faces = []
-    labels = []
-    labels_to_name = {}
-
-    # دریافت داده‌ها از Redis
-    for key in redis_client.scan_iter():
-        data = json.loads(redis_client.get(key))
-        face_base64 = data['faceImage']
-        np_arr = np.frombuffer(base64.b64decode(face_base64), np.uint8)
-        face_image = cv2.imdecode(np_arr, cv2.IMREAD_GRAYSCALE)  # تبدیل به خاکستری
-
-        if face_image is not None:
-            # تغییر اندازه تصویر به 100x100
-            resized_face = cv2.resize(face_image, (100, 100))
-            faces.append(resized_face)
-            labels.append(int(key))  # فرض: شماره ملی به عنوان لیبل
-            labels_to_name[int(key)] = {
-                "full_name": f"{data['firstName']} {data['lastName']}",
-                "student_id": str(key)  # تبدیل به رشته
-            }
-
-    if faces and labels:
-        # آموزش مدل
-        model = cv2.face.LBPHFaceRecognizer_create()
-        model.train(np.array(faces), np.array(labels))
-        model.write("trainer/model.xml")  # ذخیره مدل
-
-        # ذخیره لیبل‌ها در فایل JSON
-        with open('labels_to_name.json', 'w', encoding='utf-8') as json_file:
-            json.dump(labels_to_name, json_file, ensure_ascii=False, indent=4)
+def encode_face(face):
+    """رمزگذاری JPEG برش 200x200 چهره برای ستون image جدول NewPerson"""
+    _, buffer = cv2.imencode('.jpg', face)
+    return buffer.tobytes()
+
+def prepare_upload(image_base64):
+    """
+    پردازش تصویر یک ثبت‌نام در رشته اعتبارسنجی: رمزگشایی، تشخیص و اعتبارسنجی چهره و رمزگذاری JPEG.
+    خروجی (face, face_jpeg) یا (None, None) اگر چهره معتبری یافت نشود؛ face چهره نرمال‌شده و
+    face_jpeg تصویر برش 200x200 است.
+    """
+    with metrics.timer(STAGE_METRIC, stage="decode"):
+        image = base64_to_cv2_image(image_base64)
+    with metrics.timer(STAGE_METRIC, stage="detect"):
+        face, crop, _ = detect_and_validate_face(image, get_thread_cascades())
+    if face is None:
+        return None, None
+    with metrics.timer(STAGE_METRIC, stage="encode"):
+        return face, encode_face(crop)
 
+def train_model(keep_larger_model=False):
+    """
+    آموزش کامل مدل از صفر با همه داده‌های موجود در Redis.
+    این عملیات با تعداد افراد رشد خطی دارد و فقط در training_executor (کار /admin/retrain یا بازسازی خودکار) اجرا می‌شود؛
+    ثبت‌نام عادی از update_model استفاده می‌کند.
+    تا وقتی کلیدهای قدیمی منتقل نشده‌اند UnmigratedSamplesError می‌دهد، چون load_all آن‌ها را نمی‌خواند
+    و مدل بدون افراد ثبت‌نام‌شده پیش از مهاجرت ساخته می‌شد.
+    keep_larger_model: اگر Redis افراد کمتری از مدل فعلی داشته باشد، مدل جایگزین نمی‌شود.
+    خروجی True اگر مدل بازسازی شده باشد.
+    """
+    face_store.require_migrated()
+    # دریافت یک‌جای نمونه‌های خام 100x100 از Redis (بدون رمزگشایی)
+    with metrics.timer(STAGE_METRIC, stage="train_load"):
+        faces, labels, labels_to_name = face_store.load_all()
+    if keep_larger_model and len(labels_to_name) < model_store.identity_count:
+        logging.warning(f"Redis فقط {len(labels_to_name)} نفر از {model_store.identity_count} نفر مدل فعلی را دارد؛ "
+                        f"مدل فعلی حفظ شد.")
+        return False
+    # نمونه‌های قدیمی بدون یکسان‌سازی ذخیره شده‌اند؛ نرمال‌سازی دوباره چهره‌های نرمال‌شده تقریباً بی‌اثر است
+    with metrics.timer(STAGE_METRIC, stage="train_normalize"):
+        faces = face_preprocessor.normalize(faces)
+
+    if labels:
+        # آموزش مدل و ذخیره مدل و لیبل‌ها
+        with metrics.timer(STAGE_METRIC, stage="train_fit"):
+            model_store.rebuild(faces, labels, labels_to_name)
         logging.info("مدل با موفقیت آموزش داده شد و ذخیره گردید.")
-    else:
-        logging.warning("هیچ داده‌ای برای آموزش یافت نشد.")
+        return True
+    logging.warning("هیچ داده‌ای برای آموزش یافت نشد.")
+    return False
+
+def rebuild_stale_model():
+    """
+    بازسازی پس‌زمینه مدلی که با نسخه قدیمی پیش‌پردازش چهره آموزش دیده است.
+    اگر مهاجرت Redis انجام نشده یا ناقص باشد، مدل قدیمی (با همه افراد) دست‌نخورده می‌ماند
+    و بازسازی به /admin/retrain پس از مهاجرت سپرده می‌شود.
+    """
+    try:
+        if not train_model(keep_larger_model=True):
+            logging.warning("بازسازی خودکار مدل انجام نشد؛ پس از تکمیل مهاجرت، /admin/retrain را اجرا کنید.")
+    except UnmigratedSamplesError as e:
+        logging.warning(f"بازسازی خودکار مدل انجام نشد: {e} سپس /admin/retrain را اجرا کنید.")
+    except Exception as e:
+        logging.error(f"خطا در بازسازی مدل با نسخه جدید پیش‌پردازش: {e}")
+
+if model_store.needs_rebuild:
+    # هیستوگرام‌های مدل قدیمی با چهره‌های نرمال‌شده فعلی قابل مقایسه نیستند
+    logging.warning(f"مدل با نسخه {model_store.preprocess_version} پیش‌پردازش آموزش دیده است؛ "
+                    f"بازسازی خودکار مدل آغاز شد.")
+    training_executor.submit(rebuild_stale_model)
+
+def update_model(national_code, first_name, last_name, face_image):
+    """به‌روزرسانی افزایشی مدل فقط با چهره فرد جدید (بدون خواندن دوباره Redis)"""
+    model_store.add_identity(int(national_code), f"{first_name} {last_name}", face_image)
+    logging.info(f"مدل برای کد ملی {national_code} به صورت افزایشی به‌روزرسانی شد.")
 
 def save_to_redis(national_code, first_name, last_name, face_image):
-    """ذخیره اطلاعات کاربر در Redis"""
+    """ذخیره اطلاعات کاربر در مخزن نمونه‌های چهره در Redis"""
     try:
-        _, buffer = cv2.imencode('.jpg', face_image)
-        base64_face = base64.b64encode(buffer).decode('utf-8')
-
-        face_data = {
-            "firstName": first_name,
-            "lastName": last_name,
-            "faceImage": base64_face,
-            "detectionTime": JalaliDateTime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        redis_client.set(national_code, json.dumps(face_data))
+        face_store.save(national_code, first_name, last_name, face_image)
         logging.info(f"اطلاعات برای کد ملی {national_code} در Redis با موفقیت ذخیره شد.")
     except Exception as e:
         logging.error(f"خطا در ذخیره اطلاعات در Redis: {e}")
         raise ValueError("ذخیره‌سازی در Redis با خطا مواجه شد.")
 
-def save_to_mysql(national_code, first_name, last_name, face_image):
-    """ذخیره اطلاعات کاربر در جدول NewPerson در MySQL"""
-    cursor = None
+def save_to_mysql(national_code, first_name, last_name, face_image, face_jpeg=None):
+    """
+    ذخیره اطلاعات کاربر در جدول NewPerson در MySQL
+    face_jpeg: تصویر رمزگذاری‌شده چهره (در صورت نبود، همین‌جا رمزگذاری می‌شود)
+    """
     try:
-        cursor = mysql_connection.cursor()
-
-        # بررسی وجود کاربر در جدول NewPerson
-        cursor.execute("SELECT COUNT(*) FROM NewPerson WHERE national_code = %s", (national_code,))
-        count = cursor.fetchone()[0]
-
-        if count == 0:
-            # تبدیل تصویر به باینری جهت ذخیره در ستون longblob
-            _, buffer = cv2.imencode('.jpg', face_image)
-            image_bytes = buffer.tobytes()
-
-            cursor.execute(
-                "INSERT INTO NewPerson (national_code, first_name, last_name, image) VALUES (%s, %s, %s, %s)",
-                (national_code, first_name, last_name, image_bytes)
-            )
-            mysql_connection.commit()
-            logging.info(f"کاربر {national_code} در جدول NewPerson ثبت شد.")
-        else:
-            logging.info(f"کاربر {national_code} از قبل در جدول NewPerson موجود است.")
+        with mysql_connection() as connection:
+            cursor = connection.cursor()
+            try:
+                # بررسی وجود کاربر در جدول NewPerson
+                cursor.execute("SELECT COUNT(*) FROM NewPerson WHERE national_code = %s", (national_code,))
+                count = cursor.fetchone()[0]
+
+                if count == 0:
+                    # تصویر باینری جهت ذخیره در ستون longblob
+                    image_bytes = face_jpeg if face_jpeg is not None else encode_face(face_image)
+                    cursor.execute(
+                        "INSERT INTO NewPerson (national_code, first_name, last_name, image) VALUES (%s, %s, %s, %s)",
+                        (national_code, first_name, last_name, image_bytes)
+                    )
+                    connection.commit()
+            finally:
+                cursor.close()
     except Exception as e:
         logging.error(f"خطا در ذخیره اطلاعات در MySQL: {e}")
         raise
-    finally:
-        if cursor:
-            cursor.close()
+
+    if count == 0:
+        logging.info(f"کاربر {national_code} در جدول NewPerson ثبت شد.")
+        # باطل کردن کش هویت پروسه‌های دوربین برای این کد ملی
+        try:
+            redis_client.publish(IDENTITY_CHANNEL, national_code)
+        except redis.RedisError as e:
+            logging.warning(f"خطا در انتشار پیام باطل‌سازی کش هویت: {e}")
+    else:
+        logging.info(f"کاربر {national_code} از قبل در جدول NewPerson موجود است.")
+
+def save_many_to_redis(people):
+    """ذخیره دسته‌ای افراد (national_code, first_name, last_name, face, face_jpeg) در Redis با یک pipeline"""
+    face_store.save_many([person[:4] for person in people])
+    logging.info(f"اطلاعات {len(people)} نفر در Redis ذخیره شد.")
+
+def save_many_to_mysql(people):
+    """
+    ثبت دسته‌ای افراد جدید در جدول NewPerson با یک کوئری بررسی، یک executemany و یک commit.
+    خروجی: فهرست کدهای ملی که واقعاً ثبت شدند.
+    """
+    if not people:
+        return []
+    try:
+        with mysql_connection() as connection:
+            cursor = connection.cursor()
+            try:
+                codes = [person[0] for person in people]
+                placeholders = ", ".join(["%s"] * len(codes))
+                cursor.execute(
+                    f"SELECT national_code FROM NewPerson WHERE national_code IN ({placeholders})", tuple(codes)
+                )
+                existing = {str(row[0]) for row in cursor.fetchall()}
+
+                # تصاویر JPEG از قبل در رشته‌های اعتبارسنجی رمزگذاری شده‌اند
+                rows = [
+                    (national_code, first_name, last_name, face_jpeg)
+                    for national_code, first_name, last_name, _, face_jpeg in people
+                    if national_code not in existing
+                ]
+                if rows:
+                    cursor.executemany(
+                        "INSERT INTO NewPerson (national_code, first_name, last_name, image) VALUES (%s, %s, %s, %s)",
+                        rows
+                    )
+                    connection.commit()
+            finally:
+                cursor.close()
+        inserted = [row[0] for row in rows]
+        logging.info(f"{len(inserted)} کاربر جدید در جدول NewPerson ثبت شد.")
+    except Exception as e:
+        logging.error(f"خطا در ذخیره دسته‌ای اطلاعات در MySQL: {e}")
+        raise
+
+    # باطل کردن کش هویت پروسه‌های دوربین برای افراد جدید
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for national_code in inserted:
+            pipe.publish(IDENTITY_CHANNEL, national_code)
+        pipe.execute()
+    except redis.RedisError as e:
+        logging.warning(f"خطا در انتشار پیام باطل‌سازی کش هویت: {e}")
+    return inserted
+
+def validate_national_code(national_code):
+    """
+    کد ملی به عنوان لیبل مدل LBPH استفاده می‌شود، پس باید عددی و در بازه عدد صحیح 32 بیتی باشد.
+    این بررسی پیش از نوشتن در Redis و MySQL انجام می‌شود تا کد نامعتبر پس از ذخیره، آموزش مدل را خراب نکند.
+    """
+    if not str(national_code).isdigit() or int(national_code) > 2 ** 31 - 1:
+        raise ValueError(f"کد ملی {national_code} معتبر نیست.")
 
 def validate_inputs(data):
     """اعتبارسنجی ورودی‌های دریافتی از کلاینت"""
@@ -173,6 +380,7 @@ def validate_inputs(data):
     for field in required_fields:
         if not data.get(field):
             raise ValueError(f"فیلد {field} الزامی است.")
+    validate_national_code(data["nationalCode"])
     return True
 
 # --------------------- روت آپلود تصویر ---------------------
@@ -184,22 +392,24 @@ def upload_image():
         # اعتبارسنجی ورودی‌ها
         validate_inputs(data)
 
-        # تبدیل تصویر Base64 به تصویر OpenCV
-        image = base64_to_cv2_image(data["image"])
-
-        # تشخیص و تایید چهره
-        face, _ = detect_and_validate_face(image)
+        # رمزگشایی تصویر، تشخیص و تایید چهره و رمزگذاری JPEG در رشته‌های اعتبارسنجی
+        face, face_jpeg = validation_executor.submit(prepare_upload, data["image"]).result()
         if face is None:
             return jsonify({"status": "error", "message": "چهره شناسایی نشد یا چهره ناقص است"}), 400
 
         # ذخیره در Redis
-        save_to_redis(data["nationalCode"], data["firstName"], data["lastName"], face)
+        with metrics.timer(STAGE_METRIC, stage="redis"):
+            save_to_redis(data["nationalCode"], data["firstName"], data["lastName"], face)
 
         # ثبت اطلاعات کاربر در MySQL (جدول NewPerson)
-        save_to_mysql(data["nationalCode"], data["firstName"], data["lastName"], face)
+        with metrics.timer(STAGE_METRIC, stage="mysql"):
+            save_to_mysql(data["nationalCode"], data["firstName"], data["lastName"], face, face_jpeg)
 
-        # آموزش مدل با داده‌های جدید
-        train_model()
+        # به‌روزرسانی افزایشی مدل با چهره جدید در صف آموزش
+        with metrics.timer(STAGE_METRIC, stage="model_update"):
+            training_executor.submit(
+                update_model, data["nationalCode"], data["firstName"], data["lastName"], face
+            ).result()
 
         return jsonify({"status": "success", "message": "اطلاعات با موفقیت ذخیره شد و مدل به‌روزرسانی گردید."})
 
@@ -210,5 +420,221 @@ def upload_image():
         logging.error(f"خطا در آپلود تصویر: {e}")
         return jsonify({"status": "error", "message": "خطا در پردازش تصویر"}), 500
 
+# --------------------- ثبت‌نام دسته‌ای ---------------------
+def read_batch_upload():
+    """
+    خواندن درخواست ثبت‌نام دسته‌ای و تولید (national_code, first_name, last_name, image_bytes).
+    دو قالب پشتیبانی می‌شود:
+      - multipart با فیلد manifest (JSON) و فایل‌های images
+      - multipart با یک فایل zip در فیلد archive که شامل manifest.json و تصاویر است
+    هر عضو manifest شامل file، nationalCode، firstName و lastName است.
+    فایل‌ها یکی‌یکی خوانده می‌شوند و Flask فایل‌های بزرگ را روی دیسک نگه می‌دارد.
+    """
+    if "archive" in request.files:
+        archive = zipfile.ZipFile(request.files["archive"].stream)
+        manifest = json.loads(archive.read("manifest.json"))
+        read_file = archive.read
+    else:
+        manifest = json.loads(request.form.get("manifest", "[]"))
+        files = {f.filename: f for f in request.files.getlist("images")}
+        read_file = lambda name: files[name].read()
+
+    if not manifest:
+        raise ValueError("فهرست افراد (manifest) خالی است.")
+    for entry in manifest:
+        for field in ["file", "nationalCode", "firstName", "lastName"]:
+            if not entry.get(field):
+                raise ValueError(f"فیلد {field} در manifest الزامی است.")
+        try:
+            image_bytes = read_file(entry["file"])
+        except KeyError:
+            raise ValueError(f"فایل {entry['file']} در درخواست موجود نیست.")
+        yield str(entry["nationalCode"]), entry["firstName"], entry["lastName"], image_bytes
+
+def validate_enrollment(national_code, first_name, last_name, image_bytes):
+    """
+    رمزگشایی، اعتبارسنجی و رمزگذاری JPEG چهره یک فرد در رشته اعتبارسنجی.
+    خروجی (فرد, خطا) که فرد به صورت (national_code, first_name, last_name, face, face_jpeg) است.
+    """
+    try:
+        validate_national_code(national_code)
+        image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            return None, "تصویر معتبر نیست."
+        face, crop, _ = detect_and_validate_face(image, get_thread_cascades())
+        if face is None:
+            return None, "چهره شناسایی نشد یا چهره ناقص است"
+        return (national_code, first_name, last_name, face, encode_face(crop)), None
+    except Exception as e:
+        return None, str(e)
+
+def prune_training_jobs(now):
+    """حذف کارهای پایان‌یافته قدیمی‌تر از JOB_TTL و قدیمی‌ترین‌ها بیش از MAX_FINISHED_JOBS؛ با قفل فراخوانی شود"""
+    finished = [job_id for job_id, job in training_jobs.items() if "finishedAt" in job]
+    expired = {job_id for job_id in finished if now - training_jobs[job_id]["finishedAt"] > JOB_TTL}
+    # ترتیب درج دیکشنری ترتیب ایجاد کارها است
+    expired.update(job_id for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)])
+    for job_id in expired:
+        del training_jobs[job_id]
+
+def create_job(**fields):
+    """ثبت یک کار آموزش جدید با وضعیت queued؛ خروجی شناسه کار"""
+    job_id = uuid.uuid4().hex
+    with training_jobs_lock:
+        prune_training_jobs(time.time())
+        training_jobs[job_id] = {"status": "queued", **fields}
+    return job_id
+
+def set_job_status(job_id, **fields):
+    if fields.get("status") in ("done", "failed"):
+        fields["finishedAt"] = time.time()
+    with training_jobs_lock:
+        training_jobs[job_id].update(fields)
+
+def run_training_job(job_id, people):
+    """کار پس‌زمینه: به‌روزرسانی افزایشی مدل با همه افراد یک دسته در یک مرحله"""
+    set_job_status(job_id, status="running")
+    try:
+        with metrics.timer(STAGE_METRIC, stage="model_update"):
+            model_store.add_identities([
+                (int(national_code), f"{first_name} {last_name}", face)
+                for national_code, first_name, last_name, face, _ in people
+            ])
+        set_job_status(job_id, status="done")
+        logging.info(f"کار آموزش {job_id} برای {len(people)} نفر کامل شد.")
+    except Exception as e:
+        logging.error(f"خطا در کار آموزش {job_id}: {e}")
+        set_job_status(job_id, status="failed", error=str(e))
+
+@app.route('/upload/batch', methods=['POST'])
+def upload_batch():
+    """
+    ثبت‌نام دسته‌ای: اعتبارسنجی موازی، ذخیره دسته‌ای و صف کردن یک کار آموزش پس‌زمینه.
+    حداکثر MAX_PENDING_VALIDATIONS تصویر همزمان در حافظه و صف اعتبارسنجی است؛ تصویر بعدی فقط پس از
+    دریافت نتیجه قدیمی‌ترین تصویر در حال پردازش خوانده می‌شود.
+    """
+    try:
+        people, rejected = {}, []
+        pending = collections.deque()
+
+        def collect(index, future):
+            person, error = future.result()
+            if person is None:
+                rejected.append({"index": index, "message": error})
+            else:
+                # در صورت تکرار یک کد ملی در دسته، آخرین تصویر معتبر استفاده می‌شود
+                people[person[0]] = person
+
+        for index, item in enumerate(read_batch_upload()):
+            if len(pending) >= MAX_PENDING_VALIDATIONS:
+                collect(*pending.popleft())
+            pending.append((index, validation_executor.submit(validate_enrollment, *item)))
+        while pending:
+            collect(*pending.popleft())
+        people = list(people.values())
+
+        if not people:
+            return jsonify({"status": "error", "message": "هیچ چهره معتبری یافت نشد", "rejected": rejected}), 400
+
+        with metrics.timer(STAGE_METRIC, stage="redis"):
+            save_many_to_redis(people)
+        with metrics.timer(STAGE_METRIC, stage="mysql"):
+            save_many_to_mysql(people)
+
+        job_id = create_job(total=len(people))
+        training_executor.submit(run_training_job, job_id, people)
+
+        return jsonify({
+            "status": "accepted",
+            "jobId": job_id,
+            "accepted": len(people),
+            "rejected": rejected
+        }), 202
+
+    except (ValueError, zipfile.BadZipFile, json.JSONDecodeError) as ve:
+        logging.error(f"خطای ورودی: {ve}")
+        return jsonify({"status": "error", "message": str(ve)}), 400
+    except Exception as e:
+        logging.error(f"خطا در ثبت‌نام دسته‌ای: {e}")
+        return jsonify({"status": "error", "message": "خطا در پردازش تصاویر"}), 500
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """وضعیت یک کار آموزش پس‌زمینه (queued، running، done یا failed)"""
+    with training_jobs_lock:
+        job = training_jobs.get(job_id)
+        job = dict(job) if job is not None else None
+    if job is None:
+        return jsonify({"status": "error", "message": "کار یافت نشد"}), 404
+    return jsonify({"jobId": job_id, **job})
+
+# --------------------- متریک‌ها ---------------------
+def queued_training_jobs():
+    with training_jobs_lock:
+        return [({}, sum(1 for job in training_jobs.values() if job["status"] in ("queued", "running")))]
+
+metrics.describe(STAGE_METRIC, "Latency of enrollment and training stages")
+metrics.register_gauge("training_jobs_pending", queued_training_jobs)
+metrics.register_gauge("model_last_update_seconds", lambda: [({}, model_store.last_update_seconds)])
+metrics.register_gauge("model_last_save_seconds", lambda: [({}, model_store.last_save_seconds)])
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """خروجی متریک‌ها در قالب متنی Prometheus"""
+    return Response(metrics.render(), mimetype="text/plain")
+
+# --------------------- روت‌های مدیریتی ---------------------
+def run_retrain_job(job_id):
+    """کار پس‌زمینه: بازسازی کامل مدل در صف آموزش"""
+    set_job_status(job_id, status="running")
+    try:
+        train_model()
+        set_job_status(job_id, status="done")
+    except Exception as e:
+        logging.error(f"خطا در بازسازی مدل: {e}")
+        set_job_status(job_id, status="failed", error=str(e))
+
+@app.route('/admin/retrain', methods=['POST'])
+def retrain_model():
+    """صف کردن بازسازی کامل مدل از روی همه چهره‌های ذخیره‌شده در Redis؛ وضعیت از /jobs/<job_id>"""
+    try:
+        # بررسی زودهنگام مهاجرت تا خطا مستقیم به درخواست‌کننده برگردد؛ train_model دوباره بررسی می‌کند
+        face_store.require_migrated()
+        job_id = create_job(kind="retrain")
+        training_executor.submit(run_retrain_job, job_id)
+        return jsonify({"status": "accepted", "jobId": job_id}), 202
+    except UnmigratedSamplesError as e:
+        logging.error(f"بازسازی مدل انجام نشد: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 409
+    except Exception as e:
+        logging.error(f"خطا در بازسازی مدل: {e}")
+        return jsonify({"status": "error", "message": "خطا در بازسازی مدل"}), 500
+
+# --------------------- اجرای سرور ---------------------
+def parse_args():
+    parser = argparse.ArgumentParser(description="سرور ثبت‌نام چهره")
+    parser.add_argument("--production", action="store_true",
+                        help="اجرا با سرور WSGI چندرشته‌ای waitress به جای سرور توسعه Flask")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=16,
+                        help="تعداد رشته‌های درخواست در حالت production (پردازش تصویر روی validation_executor است)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if not args.production:
+        app.run(host=args.host, port=args.port, debug=True)
+        return
+
+    # یک پروسه با چند رشته: مدل افزایشی و صف آموزش در حافظه همین پروسه نگه‌داری می‌شوند،
+    # پس اجرای چند پروسه WSGI باعث واگرایی مدل‌ها می‌شد
+    try:
+        from waitress import serve
+    except ImportError:
+        raise SystemExit("برای حالت production بسته waitress لازم است: pip install waitress")
+    logging.info(f"سرور روی http://{args.host}:{args.port} با {args.threads} رشته اجرا می‌شود.")
+    serve(app, host=args.host, port=args.port, threads=args.threads)
+
 if __name__ == "__main__":
-    app.run(debug=True)
+    main()